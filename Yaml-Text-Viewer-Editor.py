@@ -1,11 +1,197 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox, scrolledtext
+import tkinter.font as tkfont
 import os
-import glob
-# import yaml # PyYAML # Replaced with ruamel.yaml
-from ruamel.yaml import YAML
-from ruamel.yaml.error import YAMLError # For exception handling
+import sys
 import re
+import time
+import bisect
+import threading
+import multiprocessing
+import importlib.util
+from yaml_text_engine import (COMPARE_STATUSES, PROFILER, BackgroundFolderLoader, CommitError, DocumentWriteBack, EditJournal,
+                              FolderWatcher, ItemFilter, SearchScope, TextItemStore, TrigramIndex, cached_trigram_postings,
+                              compare_folder_records, compile_glossary, compile_search_pattern, default_journal_path,
+                              default_parse_cache_path, default_session_path, export_items, find_stale_files, format_key_path,
+                              guess_exchange_format, import_translations, item_index_mapper, iter_folder_records, read_glossary,
+                              read_session, replay_journal, scan_order_key, scan_yaml_files, search_replacement, write_session)
+import yaml_text_engine
+
+LOAD_POLL_INTERVAL_MS = 50 # How often the UI drains finished parse results
+LOAD_BATCH_TIME_BUDGET_S = 0.05 # Max time spent inserting rows per poll, keeps the window responsive
+LIST_MATCHES_LIMIT = 10000 # Max rows shown by "List All"
+WRITE_BACK_DELAY_MS = 1500 # Edits are written to disk this long after the last one
+WATCH_CHECK_INTERVAL_MS = 500 # How often the folder watcher's collected changes are applied
+FILTER_DEBOUNCE_MS = 150 # The filter box applies its term once typing paused this long
+FILTER_TIME_SLICE_S = 0.03 # Max time spent filtering between redraws, keeps typing responsive
+FILTER_MODE_LABELS = {"Text": 'text', "Key Path": 'key', "File": 'file'}
+STATS_SLOWEST_FILES = 20 # Files listed under "slowest to parse" in the stats panel
+COMPARE_LIST_LIMIT = 10000 # Max rows the compare window lists for one status
+COMPARE_STATUS_LABELS = {'missing': "Missing", 'extra': "Extra", 'identical': "Untranslated (identical)", 'changed': "Changed"}
+# Settings kept by the saved session, in the order they are restored: search options before the term
+# (changing an option resets the search position), the filter last.
+SESSION_VARIABLES = ("include_var", "exclude_var", "recursive_var", "out_of_core_var", "watch_var", "case_sensitive_var",
+                     "regex_var", "whole_word_var", "scope_keys_var", "scope_files_var", "replace_var", "search_var",
+                     "filter_mode_var", "filter_var")
+
+# Regex for symbols.
+SYMBOL_REGEX = re.compile(
+    r"("
+    r"\\(?:aub|kel|her|Com|SINV|sinv)(?:\[[0-9]+\]|[0-9]*[^\s\\]*)"
+    r"|"
+    r"\\(?:n|c|mar)(?:\[[0-9]+\]|[0-9]*)?"
+    r"|"
+    r"\\!"       # \!
+    r"|<br>"      # <br>
+    r"|\\\{"     # \{
+    r"|\\\}"     # \}
+    r"|\\[\\]"   # [] (literal brackets)
+    r"|<>"        # <> (literal angle brackets)
+    r"|\\"        # \ (literal backslash, if not part of a longer code)
+    r")"
+)
+
+def symbol_segments(preview_text):
+    """Splits preview_text into [text, tag, ...] segments, tagging the symbols SYMBOL_REGEX finds."""
+    segments = []
+    last_end = 0
+    for match in SYMBOL_REGEX.finditer(preview_text):
+        start, end = match.span()
+        if start > last_end:
+            segments += [preview_text[last_end:start], "text_preview_color"]
+        segments += [preview_text[start:end], "symbol_color"]
+        last_end = end
+    if last_end < len(preview_text):
+        segments += [preview_text[last_end:], "text_preview_color"]
+    return segments
+
+
+class VirtualListView(tk.Frame):
+    """A Text-based list that only renders the rows currently on screen.
+
+    Items are pulled from the item_count() and row_segments(item) callbacks,
+    where row_segments returns a flat [text, tag, text, tag, ...] list for one
+    item. The Text widget therefore holds one screenful of lines however many
+    items the model has, and the scrollbar maps directly onto row numbers.
+    Row r shows item r, or item row_items[r] while row_items (an ascending
+    sequence of item indices, e.g. a filter result) is set.
+    """
+
+    def __init__(self, master, item_count, row_segments, **text_options):
+        super().__init__(master)
+        self._item_count = item_count
+        self._row_segments = row_segments
+        self.row_items = None
+        self.first_row = 0
+        self.highlighted_item = None
+
+        self.scrollbar = tk.Scrollbar(self, command=self._on_scrollbar)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.text = tk.Text(self, wrap=tk.NONE, state=tk.DISABLED, **text_options)
+        self.text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self._line_height = max(1, tkfont.Font(font=self.text.cget("font")).metrics("linespace"))
+
+        self.text.bind("<Configure>", lambda event: self.refresh())
+        self.text.bind("<MouseWheel>", self._on_mousewheel) # Windows / macOS
+        self.text.bind("<Button-4>", lambda event: self.scroll_rows(-3)) # X11
+        self.text.bind("<Button-5>", lambda event: self.scroll_rows(3))
+        self.text.bind("<Prior>", lambda event: self.scroll_rows(-self.visible_row_capacity()))
+        self.text.bind("<Next>", lambda event: self.scroll_rows(self.visible_row_capacity()))
+        self.text.bind("<Up>", lambda event: self.scroll_rows(-1))
+        self.text.bind("<Down>", lambda event: self.scroll_rows(1))
+
+    def visible_row_capacity(self):
+        return max(1, self.text.winfo_height() // self._line_height)
+
+    def row_count(self):
+        return self._item_count() if self.row_items is None else len(self.row_items)
+
+    def item_at_row(self, row):
+        return row if self.row_items is None else self.row_items[row]
+
+    def row_of_item(self, item):
+        """The row showing item, or None if row_items leaves it out."""
+        if self.row_items is None:
+            return item
+        row = bisect.bisect_left(self.row_items, item)
+        return row if row < len(self.row_items) and self.row_items[row] == item else None
+
+    @PROFILER.timed("render rows")
+    def refresh(self):
+        """Redraws the visible window of rows from the model."""
+        total_rows = self.row_count()
+        capacity = self.visible_row_capacity()
+        self.first_row = max(0, min(self.first_row, total_rows - capacity))
+        last_row = min(total_rows, self.first_row + capacity + 1) # +1 for a partially visible last line
+
+        self.text.config(state=tk.NORMAL)
+        self.text.delete("1.0", tk.END)
+        for row in range(self.first_row, last_row):
+            self.text.insert(tk.END, *self._row_segments(self.item_at_row(row)), "\n", ())
+        highlighted_row = None if self.highlighted_item is None else self.row_of_item(self.highlighted_item)
+        if highlighted_row is not None and self.first_row <= highlighted_row < last_row:
+            line = highlighted_row - self.first_row + 1
+            self.text.tag_add("line_highlight", f"{line}.0", f"{line}.end")
+        self.text.config(state=tk.DISABLED)
+
+        if total_rows:
+            self.scrollbar.set(self.first_row / total_rows, min(1.0, (self.first_row + capacity) / total_rows))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def refresh_item(self, item):
+        row = self.row_of_item(item)
+        if row is not None and self.first_row <= row <= self.first_row + self.visible_row_capacity():
+            self.refresh()
+
+    def scroll_rows(self, delta):
+        self.first_row = max(0, self.first_row + delta)
+        self.refresh()
+        return "break"
+
+    def see(self, item):
+        """Scrolls so that item is visible, centring it if it was off screen.
+
+        Returns False (and does not scroll) if row_items leaves item out.
+        """
+        row = self.row_of_item(item)
+        if row is None:
+            return False
+        capacity = self.visible_row_capacity()
+        if not (self.first_row <= row < self.first_row + capacity):
+            self.first_row = max(0, row - capacity // 2)
+        self.refresh()
+        return True
+
+    def highlight(self, item):
+        self.highlighted_item = item
+        self.refresh()
+
+    def clear_highlight(self):
+        if self.highlighted_item is not None:
+            self.highlighted_item = None
+            self.refresh()
+
+    def item_at(self, x, y):
+        """Returns the model item under widget coordinates (x, y), or None."""
+        try:
+            line_number = int(self.text.index(f"@{x},{y}").split('.')[0])
+        except (tk.TclError, ValueError):
+            return None
+        row = self.first_row + line_number - 1
+        return self.item_at_row(row) if 0 <= row < self.row_count() else None
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == tk.MOVETO:
+            self.first_row = int(float(amount) * self.row_count())
+            self.refresh()
+        elif action == tk.SCROLL:
+            step = self.visible_row_capacity() if unit == tk.PAGES else 1
+            self.scroll_rows(int(amount) * step)
+
+    def _on_mousewheel(self, event):
+        return self.scroll_rows(-3 if event.delta > 0 else 3)
+
 
 class YamlTextEditorApp:
     def __init__(self, master):
@@ -13,27 +199,97 @@ class YamlTextEditorApp:
         master.title("YAML Text Viewer/Editor By MrGamesKingPro")
         master.geometry("800x650") # Increased height for search bar
 
-        # Initialize ruamel.yaml parser
-        self.yaml_parser = YAML()
-        self.yaml_parser.preserve_quotes = True
-        # We rely on ruamel.yaml's round-trip capabilities to preserve existing indentation.
-        # If specific default indentation is needed for *newly generated* YAML parts,
-        # it can be set e.g., self.yaml_parser.indent(mapping=2, sequence=4, offset=2)
-        # but for preserving existing formats, this is often not needed.
+        # ruamel.yaml itself is imported when the first file is parsed or written; only make sure it is there
+        if importlib.util.find_spec("ruamel.yaml") is None:
+            raise ImportError("No module named 'ruamel.yaml'")
+
+        # Batches edits per file, see flush_pending_writes; makes its ruamel.yaml parser on the first write
+        self.write_back = DocumentWriteBack()
+        self._write_back_after_id = None
+        self.journal = None # EditJournal of the loaded folder: every edit is logged there before it is written
+        self._import_op = None # Journal operation of the import running in the background, see import_strings
 
         self.current_folder_path = tk.StringVar()
-        self.text_data = [] # List to store info about each text item
+        self.text_data = TextItemStore() # Every text item, in file order; text_data[idx] reads like a dict
+        self.search_index = TrigramIndex() # Narrows search candidates, kept in step with text_data
+        self._search_candidates_cache = (None, None) # ((term, options, index generation), candidates)
+        self._search_scope = (None, SearchScope(None)) # ((folder, key patterns, file patterns), scope)
         self._item_count_for_status = 0 # Helper for counting items in load_files_from_folder
+        self._folder_loader = None # BackgroundFolderLoader while a folder is being parsed
+        self._folder_load_after_id = None
+        self._folder_load_errors = 0
+        self.parse_cache_path = default_parse_cache_path()
+        self._watcher = None # FolderWatcher of the loaded folder, see _poll_watcher
+        self._watch_after_id = None
+        self._reload_loader = None # BackgroundFolderLoader re-reading files the watcher reported
+        self._reload_patches = {} # What _reload_loader read so far, see _finish_reload
+        self._edit_window = None
+        self.item_filter = ItemFilter(self.text_data, None) # Rebuilt with text_data, see load_files_from_folder
+        self._filter_run = None # FilterRun being applied, a time slice per _advance_filter
+        self._filter_after_id = None
+        self._filter_debounce_id = None
+        self._load_started = None # time.perf_counter() when the current folder load began
+        self._stats_window = None
+        self._shown_profile = None # PROFILER.last_profile already printed to the console
+        self.session_path = default_session_path()
+        self._load_complete = False # Whether text_data holds every file of the folder, see save_session
+        self._file_signatures = {} # filepath -> (mtime_ns, size) of each loaded file when it was read
+        self._session_check = None # While restored files are compared with the disk: a token, then the reloading loader
+        self._restored_top_item = None # Item to scroll to once the restored filter reaches it
 
         # --- Top Frame for Folder Selection ---
         top_frame = tk.Frame(master)
         top_frame.pack(fill=tk.X, padx=10, pady=5)
 
         tk.Label(top_frame, text="Folder:").pack(side=tk.LEFT)
-        self.folder_entry = tk.Entry(top_frame, textvariable=self.current_folder_path, state='readonly', width=60)
+        self.folder_entry = tk.Entry(top_frame, textvariable=self.current_folder_path, state='readonly', width=30)
         self.folder_entry.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=5)
         self.browse_button = tk.Button(top_frame, text="Browse...", command=self.browse_folder)
         self.browse_button.pack(side=tk.LEFT)
+        self.cancel_load_button = tk.Button(top_frame, text="Cancel", command=self._cancel_folder_load, state=tk.DISABLED)
+        self.cancel_load_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.write_now_button = tk.Button(top_frame, text="Write Now", command=self.flush_pending_writes, state=tk.DISABLED)
+        self.write_now_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.undo_button = tk.Button(top_frame, text="Undo", command=self.undo_edit, state=tk.DISABLED)
+        self.undo_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.redo_button = tk.Button(top_frame, text="Redo", command=self.redo_edit, state=tk.DISABLED)
+        self.redo_button.pack(side=tk.LEFT, padx=(2, 0))
+        self.export_button = tk.Button(top_frame, text="Export...", command=self.export_strings)
+        self.export_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.import_button = tk.Button(top_frame, text="Import...", command=self.import_strings)
+        self.import_button.pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(top_frame, text="Compare...", command=self.open_compare_window).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(top_frame, text="Stats...", command=self.open_stats_panel).pack(side=tk.LEFT, padx=(5, 0))
+        master.bind("<Control-s>", lambda event: self.flush_pending_writes())
+        master.bind("<Control-z>", lambda event: self.undo_edit())
+        master.bind("<Control-y>", lambda event: self.redo_edit())
+        master.bind("<Control-Z>", lambda event: self.redo_edit()) # Ctrl+Shift+Z
+
+        # --- Scan Options Frame (which files of the folder are loaded) ---
+        scan_frame = tk.Frame(master)
+        scan_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        tk.Label(scan_frame, text="Include:").pack(side=tk.LEFT)
+        self.include_var = tk.StringVar(value="; ".join(yaml_text_engine.DEFAULT_INCLUDE_PATTERNS))
+        self.include_entry = tk.Entry(scan_frame, textvariable=self.include_var, width=20)
+        self.include_entry.pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(scan_frame, text="Exclude:").pack(side=tk.LEFT)
+        self.exclude_var = tk.StringVar()
+        self.exclude_entry = tk.Entry(scan_frame, textvariable=self.exclude_var, width=20)
+        self.exclude_entry.pack(side=tk.LEFT, padx=(2, 10))
+        self.recursive_var = tk.BooleanVar(value=True)
+        self.recursive_check = tk.Checkbutton(scan_frame, text="Subfolders", variable=self.recursive_var)
+        self.recursive_check.pack(side=tk.LEFT)
+        self.out_of_core_var = tk.BooleanVar(value=False)
+        self.out_of_core_check = tk.Checkbutton(scan_frame, text="Keep Texts on Disk", variable=self.out_of_core_var)
+        self.out_of_core_check.pack(side=tk.LEFT, padx=(5, 0))
+        self.watch_var = tk.BooleanVar(value=True)
+        self.watch_check = tk.Checkbutton(scan_frame, text="Watch for Changes", variable=self.watch_var, command=self._restart_watcher)
+        self.watch_check.pack(side=tk.LEFT, padx=(5, 0))
+        self.rescan_button = tk.Button(scan_frame, text="Rescan", command=self.rescan_folder)
+        self.rescan_button.pack(side=tk.LEFT, padx=(5, 0))
+        self.include_entry.bind("<Return>", lambda event: self.rescan_folder())
+        self.exclude_entry.bind("<Return>", lambda event: self.rescan_folder())
 
         # --- Search/Replace Frame ---
         search_frame = tk.Frame(master)
@@ -59,10 +315,53 @@ class YamlTextEditorApp:
         self.replace_all_button = tk.Button(search_frame, text="Replace All", command=self.replace_all_text, state=tk.DISABLED)
         self.replace_all_button.pack(side=tk.LEFT, padx=2)
 
+        self.count_button = tk.Button(search_frame, text="Count", command=self.count_matches, state=tk.DISABLED)
+        self.count_button.pack(side=tk.LEFT, padx=2)
+
+        self.list_all_button = tk.Button(search_frame, text="List All", command=self.list_all_matches, state=tk.DISABLED)
+        self.list_all_button.pack(side=tk.LEFT, padx=2)
+
         self.case_sensitive_var = tk.BooleanVar(value=True)
         self.case_sensitive_check = tk.Checkbutton(search_frame, text="Case Sensitive", variable=self.case_sensitive_var)
         self.case_sensitive_check.pack(side=tk.LEFT, padx=(5,0))
 
+        # --- Search Options Frame (how the term is matched, and where) ---
+        search_options_frame = tk.Frame(master)
+        search_options_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        self.regex_var = tk.BooleanVar(value=False)
+        self.regex_check = tk.Checkbutton(search_options_frame, text="Regex", variable=self.regex_var)
+        self.regex_check.pack(side=tk.LEFT)
+        self.whole_word_var = tk.BooleanVar(value=False)
+        self.whole_word_check = tk.Checkbutton(search_options_frame, text="Whole Word", variable=self.whole_word_var)
+        self.whole_word_check.pack(side=tk.LEFT, padx=(5, 10))
+        tk.Label(search_options_frame, text="In Keys:").pack(side=tk.LEFT)
+        self.scope_keys_var = tk.StringVar()
+        tk.Entry(search_options_frame, textvariable=self.scope_keys_var, width=18).pack(side=tk.LEFT, padx=(2, 10))
+        tk.Label(search_options_frame, text="In Files:").pack(side=tk.LEFT)
+        self.scope_files_var = tk.StringVar()
+        tk.Entry(search_options_frame, textvariable=self.scope_files_var, width=18).pack(side=tk.LEFT, padx=(2, 10))
+        self.glossary_button = tk.Button(search_options_frame, text="Apply Glossary...", command=self.apply_glossary)
+        self.glossary_button.pack(side=tk.LEFT)
+        tk.Button(search_options_frame, text="Duplicates...", command=self.open_duplicates_window).pack(side=tk.LEFT, padx=(5, 0))
+        for option_var in (self.regex_var, self.whole_word_var, self.case_sensitive_var, self.scope_keys_var, self.scope_files_var):
+            option_var.trace_add("write", self._on_search_options_change)
+
+        # --- Filter Frame (only the rows matching the filter are shown) ---
+        filter_frame = tk.Frame(master)
+        filter_frame.pack(fill=tk.X, padx=10, pady=(0, 5))
+
+        tk.Label(filter_frame, text="Filter:").pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        self.filter_entry = tk.Entry(filter_frame, textvariable=self.filter_var, width=30)
+        self.filter_entry.pack(side=tk.LEFT, padx=(2, 5))
+        self.filter_entry.bind("<Escape>", lambda event: self.filter_var.set(""))
+        self.filter_var.trace_add("write", self._on_filter_change)
+        self.filter_mode_var = tk.StringVar(value="Text")
+        tk.OptionMenu(filter_frame, self.filter_mode_var, *FILTER_MODE_LABELS,
+                      command=lambda mode: self._apply_filter()).pack(side=tk.LEFT)
+        tk.Button(filter_frame, text="Clear", command=lambda: self.filter_var.set("")).pack(side=tk.LEFT, padx=(5, 0))
+
         # Search state variables
         self.current_search_result = None  # (item_index, match_start_in_original, match_end_in_original)
         self.last_search_offset = (0, 0)  # (item_idx, char_idx_in_original_text)
@@ -73,13 +372,11 @@ class YamlTextEditorApp:
         main_frame = tk.Frame(master)
         main_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
 
-        self.scrollbar = tk.Scrollbar(main_frame)
-        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-
-        self.text_display_area = tk.Text(main_frame, yscrollcommand=self.scrollbar.set,
-                                         font=("Courier New", 10), wrap=tk.NONE, state=tk.DISABLED)
-        self.text_display_area.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        self.scrollbar.config(command=self.text_display_area.yview)
+        # Only the visible rows are rendered; text_data is the model behind the view.
+        self.list_view = VirtualListView(main_frame, lambda: len(self.text_data), self._row_segments,
+                                         font=("Courier New", 10))
+        self.list_view.pack(fill=tk.BOTH, expand=True)
+        self.text_display_area = self.list_view.text
 
         # Event bindings
         self.text_display_area.bind("<Double-1>", self.on_double_click)
@@ -94,125 +391,164 @@ class YamlTextEditorApp:
         self.text_display_area.tag_configure("line_highlight", background="light sky blue")
         self.text_display_area.tag_configure("symbol_color", foreground="blue") # For special symbols
 
-        # Regex for symbols.
-        self.symbol_regex = re.compile(
-            r"("
-            r"\\(?:aub|kel|her|Com|SINV|sinv)(?:\[[0-9]+\]|[0-9]*[^\s\\]*)"
-            r"|"
-            r"\\(?:n|c|mar)(?:\[[0-9]+\]|[0-9]*)?"
-            r"|"
-            r"\\!"       # \!
-            r"|<br>"      # <br>
-            r"|\\\{"     # \{
-            r"|\\\}"     # \}
-            r"|\\[\\]"   # [] (literal brackets)
-            r"|<>"        # <> (literal angle brackets)
-            r"|\\"        # \ (literal backslash, if not part of a longer code)
-            r")"
-        )
+        self.symbol_regex = SYMBOL_REGEX
 
 
         # --- Status Bar ---
+        status_frame = tk.Frame(master)
+        status_frame.pack(side=tk.BOTTOM, fill=tk.X)
         self.status_var = tk.StringVar()
-        self.status_bar = tk.Label(master, textvariable=self.status_var, bd=1, relief=tk.SUNKEN, anchor=tk.W)
-        self.status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+        self.stats_var = tk.StringVar() # Time of the last operation while "Record timings" is on
+        tk.Label(status_frame, textvariable=self.stats_var, bd=1, relief=tk.SUNKEN, anchor=tk.E).pack(side=tk.RIGHT)
+        self.status_bar = tk.Label(status_frame, textvariable=self.status_var, bd=1, relief=tk.SUNKEN, anchor=tk.W)
+        self.status_bar.pack(side=tk.LEFT, fill=tk.X, expand=True)
         self.status_var.set("Select a folder to load YAML files. Requires 'ruamel.yaml' library.")
 
+        self.profiling_var = tk.BooleanVar(value=PROFILER.enabled)
+        self.track_memory_var = tk.BooleanVar(value=False)
+        PROFILER.listener = self._on_profiled_operation
+
+        # The last session is read off the Tk thread while the window comes up
+        self._run_in_background(lambda: read_session(self.session_path), self._restore_session)
+
+    def _on_filter_change(self, *args):
+        """Debounces the filter box: rows are filtered once typing pauses."""
+        if self._filter_debounce_id is not None:
+            self.master.after_cancel(self._filter_debounce_id)
+        self._filter_debounce_id = self.master.after(FILTER_DEBOUNCE_MS, self._apply_filter)
+
+    def _apply_filter(self, keep_position=False):
+        """Starts showing only the rows that match the filter box, or every row if it is empty."""
+        if self._filter_debounce_id is not None:
+            self.master.after_cancel(self._filter_debounce_id)
+            self._filter_debounce_id = None
+        self._cancel_filter_run()
+        term = self.filter_var.get()
+        if not term or self._folder_loader is not None: # A load in progress is filtered when it ends
+            if self.list_view.row_items is not None:
+                self.list_view.row_items = None
+                self.list_view.refresh()
+            return
+        self._filter_run = self.item_filter.start(term, FILTER_MODE_LABELS[self.filter_mode_var.get()])
+        self.list_view.row_items = self._filter_run.items
+        if not keep_position:
+            self.list_view.first_row = 0
+        self._advance_filter()
+
+    def _advance_filter(self):
+        """Filters for one time slice and redraws, so the first matches show up right away."""
+        self._filter_after_id = None
+        run = self._filter_run
+        finished = run.advance(FILTER_TIME_SLICE_S)
+        if finished:
+            self._filter_run = None
+            self.status_var.set(f"Filter: showing {len(run.items)} of {len(self.text_data)} text item(s).")
+        else:
+            self.status_var.set(f"Filtering... {len(run.items)} matching text item(s) so far ({run.progress:.0%}).")
+            self._filter_after_id = self.master.after(1, self._advance_filter)
+        top_item = self._restored_top_item
+        if top_item is not None and (finished or (run.items and run.items[-1] >= top_item)):
+            self._restored_top_item = None
+            self.list_view.first_row = bisect.bisect_left(run.items, top_item)
+        self.list_view.refresh()
+
+    def _finish_filter_run(self):
+        """Filters the rest of the items at once, for operations that need every row the filter shows."""
+        run = self._filter_run
+        if run is None:
+            return
+        self._cancel_filter_run()
+        run.advance(float('inf'))
+        self.status_var.set(f"Filter: showing {len(run.items)} of {len(self.text_data)} text item(s).")
+        self.list_view.refresh()
+
+    def _cancel_filter_run(self):
+        if self._filter_after_id is not None:
+            self.master.after_cancel(self._filter_after_id)
+            self._filter_after_id = None
+        self._filter_run = None
+
+    def _on_search_options_change(self, *args):
+        # Matches found with the old options no longer apply; Find Next starts over
+        self.current_search_result = None
+        self.last_searched_term_for_find_next = ""
+        self.replace_button.config(state=tk.DISABLED)
+
     def _on_search_term_change(self, *args):
         search_term = self.search_var.get()
         if search_term:
-            self.find_next_button.config(state=tk.NORMAL)
-            self.replace_all_button.config(state=tk.NORMAL)
+            for button in (self.find_next_button, self.replace_all_button, self.count_button, self.list_all_button):
+                button.config(state=tk.NORMAL)
         else:
-            self.find_next_button.config(state=tk.DISABLED)
-            self.replace_button.config(state=tk.DISABLED)
-            self.replace_all_button.config(state=tk.DISABLED)
+            for button in (self.find_next_button, self.replace_button, self.replace_all_button,
+                           self.count_button, self.list_all_button):
+                button.config(state=tk.DISABLED)
             self.current_search_result = None
             self.last_search_offset = (0, 0)
             self.last_searched_term_for_find_next = ""
-            
-            try:
-                current_widget_state = self.text_display_area.cget("state")
-                if current_widget_state == tk.DISABLED:
-                    self.text_display_area.config(state=tk.NORMAL)
-                self.text_display_area.tag_remove("line_highlight", "1.0", tk.END)
-                if current_widget_state == tk.DISABLED:
-                    self.text_display_area.config(state=tk.DISABLED)
-            except tk.TclError: 
-                pass
-
+            self.list_view.clear_highlight()
 
     def browse_folder(self):
         folder_selected = filedialog.askdirectory()
         if folder_selected:
+            if not self.flush_pending_writes() and not messagebox.askyesno(
+                    "Unsaved Changes", "Some edits could not be written to disk. Discard them and open the new folder?", parent=self.master):
+                return
+            self._discard_pending_edits()
+            folder_selected = os.path.normpath(folder_selected) # Same separators as scanned and watched paths
             self.current_folder_path.set(folder_selected)
             self.load_files_from_folder(folder_selected)
             self.search_var.set("") 
 
-    def _insert_formatted_preview(self, preview_text):
-        last_end = 0
-        for match in self.symbol_regex.finditer(preview_text):
-            start, end = match.span()
-            if start > last_end:
-                self.text_display_area.insert(tk.INSERT, preview_text[last_end:start], "text_preview_color")
-            self.text_display_area.insert(tk.INSERT, preview_text[start:end], "symbol_color")
-            last_end = end
-        if last_end < len(preview_text):
-            self.text_display_area.insert(tk.INSERT, preview_text[last_end:], "text_preview_color")
-
-    def _extract_texts_recursive(self, yaml_data_node, current_path_parts, filepath, filename):
-        if isinstance(yaml_data_node, dict):
-            for key, value in yaml_data_node.items():
-                key_str = str(key)
-                new_path_parts = current_path_parts + [key_str]
-                
-                if isinstance(value, str):
-                    message_key_path = ".".join(new_path_parts)
-                    self.text_data.append({
-                        'filepath': filepath,
-                        'message_key': message_key_path,
-                        'original_text': value 
-                    })
-                    display_text_preview_full = str(value).replace('\n', ' ').replace('\r', '')
-                    self.text_display_area.insert(tk.END, filename, "filename_color")
-                    self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                    self.text_display_area.insert(tk.END, message_key_path, "messagekey_color")
-                    self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                    preview = display_text_preview_full[:100]
-                    if len(display_text_preview_full) > 100: preview += "..."
-                    self._insert_formatted_preview(preview) 
-                    self.text_display_area.insert(tk.END, "\n")
-                    self._item_count_for_status += 1
-                elif isinstance(value, dict): 
-                    self._extract_texts_recursive(value, new_path_parts, filepath, filename)
-                elif isinstance(value, list):
-                    for i, item in enumerate(value):
-                        indexed_key_str = f"{key_str}[{i}]"
-                        new_list_item_path_parts = current_path_parts + [indexed_key_str]
-                        if isinstance(item, str):
-                            message_key_path = ".".join(new_list_item_path_parts)
-                            self.text_data.append({
-                                'filepath': filepath,
-                                'message_key': message_key_path,
-                                'original_text': item
-                            })
-                            display_text_preview_full = str(item).replace('\n', ' ').replace('\r', '')
-                            self.text_display_area.insert(tk.END, filename, "filename_color")
-                            self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                            self.text_display_area.insert(tk.END, message_key_path, "messagekey_color")
-                            self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                            preview = display_text_preview_full[:100]
-                            if len(display_text_preview_full) > 100: preview += "..."
-                            self._insert_formatted_preview(preview)
-                            self.text_display_area.insert(tk.END, "\n")
-                            self._item_count_for_status += 1
-                        elif isinstance(item, dict):
-                            self._extract_texts_recursive(item, new_list_item_path_parts, filepath, filename)
+    def _formatted_preview_segments(self, preview_text):
+        return symbol_segments(preview_text)
+
+    def _row_segments(self, item_0_based_index):
+        """Builds the [text, tag, ...] segments the list view renders for one item."""
+        item_data = self.text_data[item_0_based_index]
+        filename = self._display_filename(item_data['filepath'])
+        display_text_preview_full = self.text_data.preview(item_0_based_index).replace('\n', ' ').replace('\r', '')
+        preview = display_text_preview_full[:yaml_text_engine.TEXT_PREVIEW_CHARS]
+        if len(display_text_preview_full) > yaml_text_engine.TEXT_PREVIEW_CHARS: preview += "..."
+        return [filename, "filename_color", " :: ", "separator_color",
+                item_data['message_key'], "messagekey_color", " :: ", "separator_color",
+                *self._formatted_preview_segments(preview)]
+
+    def _display_filename(self, filepath):
+        """Path of filepath relative to the loaded folder, so files of different subfolders can be told apart."""
+        folder_path = self.current_folder_path.get()
+        if folder_path and filepath.startswith(folder_path):
+            return filepath[len(folder_path):].lstrip("\\/")
+        return os.path.basename(filepath)
+
+    def rescan_folder(self):
+        """Reloads the current folder, e.g. after the include/exclude patterns changed."""
+        folder_path = self.current_folder_path.get()
+        if not folder_path:
+            return
+        if not self.flush_pending_writes() and not messagebox.askyesno(
+                "Unsaved Changes", "Some edits could not be written to disk. Discard them and rescan?", parent=self.master):
+            return
+        self._discard_pending_edits()
+        self.load_files_from_folder(folder_path)
 
     def load_files_from_folder(self, folder_path):
-        self.text_display_area.config(state=tk.NORMAL) 
-        self.text_display_area.delete("1.0", tk.END)   
-        self.text_data = []
+        self._cancel_folder_load(update_status=False)
+        self._open_journal(folder_path) # Edits a crash kept from the files are written before they are read
+        self._restart_watcher(folder_path) # Before scanning, so no change made during the load is missed
+        self._cancel_session_check()
+        self._restored_top_item = None
+        self._load_complete = False
+        self._file_signatures = {}
+        # Out of core, only previews stay in memory; the old store's sidecar file goes with it
+        self.text_data = TextItemStore(out_of_core=self.out_of_core_var.get())
+        self.search_index = TrigramIndex()
+        self.item_filter = ItemFilter(self.text_data, folder_path)
+        self._cancel_filter_run()
+        self.list_view.row_items = None # Rows are filtered again once the load is done
+        self.list_view.first_row = 0
+        self.list_view.highlighted_item = None
+        self.list_view.refresh()
         self._item_count_for_status = 0
         self.current_search_result = None
         self.last_search_offset = (0,0)
@@ -220,136 +556,782 @@ class YamlTextEditorApp:
         if self.search_var.get(): self._on_search_term_change()
         else: self.replace_button.config(state=tk.DISABLED)
 
-        yaml_files = glob.glob(os.path.join(folder_path, "*.yaml"))
-        yaml_files.extend(glob.glob(os.path.join(folder_path, "*.yml")))
+        # Files are scanned lazily: parsing starts with the first file found, not after the whole walk.
+        yaml_files = scan_yaml_files(folder_path, include=self.include_var.get() or yaml_text_engine.DEFAULT_INCLUDE_PATTERNS,
+                                     exclude=self.exclude_var.get(), recursive=self.recursive_var.get())
+        self._folder_loader = BackgroundFolderLoader(yaml_files, cache_path=self.parse_cache_path)
+        self._load_started = time.perf_counter()
+        self._folder_load_errors = 0
+        self.cancel_load_button.config(state=tk.NORMAL)
+        self.status_var.set(f"Scanning {folder_path}...")
+        self._folder_load_after_id = self.master.after(LOAD_POLL_INTERVAL_MS, self._poll_folder_loader)
 
-        if not yaml_files:
-            self.status_var.set(f"No YAML files found in {folder_path}")
-            self.text_display_area.config(state=tk.DISABLED)
+    @PROFILER.timed("insert rows")
+    def _poll_folder_loader(self):
+        """Moves finished parse results from the background loader into text_data and the display."""
+        self._folder_load_after_id = None
+        loader = self._folder_loader
+        if loader is None:
             return
+        deadline = time.perf_counter() + LOAD_BATCH_TIME_BUDGET_S
+        while time.perf_counter() < deadline:
+            result = loader.next_ready()
+            if result is None:
+                break
+            filepath, records, trigram_postings, text_digests, error = result
+            if error:
+                self._folder_load_errors += 1
+                self.status_var.set(f"{error.splitlines()[0][:100]}")
+                print(error)
+                continue
+            self.text_data.append_file(filepath, records, text_digests)
+            self.search_index.add_file(trigram_postings, len(records))
+            self._file_signatures[filepath] = loader.file_stats.get(filepath)
+        self._item_count_for_status = len(self.text_data)
+        self.list_view.refresh()
 
-        for filepath in yaml_files:
-            filename = os.path.basename(filepath)
-            try:
-                with open(filepath, 'r', encoding='utf-8') as f:
-                    data = self.yaml_parser.load(f) # Use ruamel.yaml load
-                if data is None: # File might be empty, comments-only, or '--- null'
-                    continue
-                self._extract_texts_recursive(data, [], filepath, filename)
-            except YAMLError as e: # Catches ruamel.yaml.error.YAMLError
-                error_msg = f"Error parsing {filename}: {str(e)[:100]}"
-                self.status_var.set(error_msg)
-                print(f"Error parsing {filepath}: {e}")
-            except Exception as e:
-                error_msg = f"Error reading {filename}: {str(e)[:100]}"
-                self.status_var.set(error_msg)
-                print(f"Error reading {filepath}: {e}")
-        
-        self.text_display_area.config(state=tk.DISABLED) 
-        self.status_var.set(f"Loaded {self._item_count_for_status} text items from {len(yaml_files)} YAML files.")
-
-    def _get_value_by_path(self, data_dict, path_str):
-        keys = path_str.split('.')
-        current_level = data_dict
-        for key_segment in keys:
-            if isinstance(current_level, dict) and key_segment in current_level:
-                current_level = current_level[key_segment]
-            else:
-                match = re.fullmatch(r"(.+)\[([0-9]+)\]", key_segment)
-                if match and isinstance(current_level, dict):
-                    list_name, idx_str = match.groups()
-                    idx = int(idx_str)
-                    if list_name in current_level and isinstance(current_level[list_name], list) and idx < len(current_level[list_name]):
-                        current_level = current_level[list_name][idx]
-                    else: return None
-                else: return None
-        return current_level
-
-    def _set_value_by_path(self, data_dict, path_str, value_to_set):
-        keys = path_str.split('.')
-        current_level = data_dict
-        for i, key_segment in enumerate(keys[:-1]):
-            match = re.fullmatch(r"(.+)\[([0-9]+)\]", key_segment)
-            if match:
-                list_name, idx_str = match.groups()
-                idx = int(idx_str)
-                if isinstance(current_level, dict) and list_name in current_level and \
-                   isinstance(current_level[list_name], list) and idx < len(current_level[list_name]):
-                    current_level = current_level[list_name][idx]
-                else: return False
-            elif isinstance(current_level, dict) and key_segment in current_level:
-                current_level = current_level[key_segment]
-            else: return False
-        
-        last_key = keys[-1]
-        match_last = re.fullmatch(r"(.+)\[([0-9]+)\]", last_key)
-        if match_last:
-            list_name, idx_str = match_last.groups()
-            idx = int(idx_str)
-            if isinstance(current_level, dict) and list_name in current_level and \
-               isinstance(current_level[list_name], list) and idx < len(current_level[list_name]):
-                current_level[list_name][idx] = value_to_set
-                return True
+        total_files = len(loader.filepaths)
+        if loader.finished:
+            self._folder_loader = None
+            loader.shutdown()
+            self.cancel_load_button.config(state=tk.DISABLED)
+            self._load_complete = loader.scan_error is None
+            if loader.scan_error is not None:
+                self.status_var.set(f"Cannot read {self.current_folder_path.get()}: {loader.scan_error}")
+                return
+            if not total_files:
+                self.status_var.set(f"No YAML files found in {self.current_folder_path.get()}")
+                return
+            status = f"Loaded {self._item_count_for_status} text items from {total_files} YAML files."
+            if loader.cache_hits:
+                status += f" ({loader.cache_hits} unchanged file(s) read from cache.)"
+            if self._folder_load_errors:
+                status += f" {self._folder_load_errors} file(s) could not be read (see console)."
+            self.status_var.set(status)
+            self._record_folder_load(total_files)
+            self._apply_filter()
+            return
+        if not self._folder_load_errors:
+            scanning = "" if loader.scan_complete else " (still scanning)"
+            self.status_var.set(f"Loading {loader.files_done}/{total_files}{scanning} YAML files... "
+                                f"{self._item_count_for_status} text items so far.")
+        self._folder_load_after_id = self.master.after(LOAD_POLL_INTERVAL_MS, self._poll_folder_loader)
+
+    def _record_folder_load(self, total_files):
+        """Adds the whole load, from scan to last row, to the profiler as one span."""
+        if PROFILER.enabled and self._load_started is not None:
+            seconds = time.perf_counter() - self._load_started
+            PROFILER.record("load folder", self._load_started, seconds,
+                            {"files": total_files, "items": self._item_count_for_status})
+            self._on_profiled_operation("load folder", seconds)
+        self._load_started = None
+
+    def _cancel_folder_load(self, update_status=True):
+        loader = self._folder_loader
+        if loader is None:
+            return
+        self._folder_loader = None
+        if self._folder_load_after_id is not None:
+            self.master.after_cancel(self._folder_load_after_id)
+            self._folder_load_after_id = None
+        loader.shutdown()
+        self.cancel_load_button.config(state=tk.DISABLED)
+        if update_status:
+            self.status_var.set(f"Loading cancelled after {loader.files_done}/{len(loader.filepaths)} files. "
+                                f"{self._item_count_for_status} text items loaded.")
+            self._apply_filter()
+
+    def on_close(self):
+        if not self.flush_pending_writes() and not messagebox.askyesno(
+                "Unsaved Changes", "Some edits could not be written to disk. Quit anyway and lose them?", parent=self.master):
+            return
+        self._discard_pending_edits()
+        self._cancel_folder_load(update_status=False)
+        self._stop_watcher()
+        self._cancel_session_check() # Files it did not get to are checked again next time
+        self.save_session()
+        if self.journal is not None:
+            self.journal.close()
+        self.master.destroy()
+
+    def save_session(self):
+        """Saves the folder, its rows, the scroll position and the search state for the next start.
+
+        Rows are only kept when the whole folder was loaded; files with edits
+        that could not be written are marked so the next start re-reads them.
+        The long texts of an out-of-core store are streamed from its sidecar.
+        """
+        folder_path = self.current_folder_path.get()
+        items = signatures = None
+        if folder_path and self._load_complete:
+            items = self.text_data.snapshot()
+            dirty = self.write_back.dirty
+            signatures = {filepath: None if filepath in dirty else self._file_signatures.get(filepath)
+                          for filepath in self.text_data.file_ranges}
+        view = self.list_view
+        top_item = view.item_at_row(view.first_row) if view.first_row < view.row_count() else None
+        search_offset = self.last_search_offset if self.last_searched_term_for_find_next == self.search_var.get() else None
+        session = {'folder': folder_path, 'variables': {name: getattr(self, name).get() for name in SESSION_VARIABLES},
+                   'view': (top_item, view.highlighted_item, search_offset), 'items': items, 'signatures': signatures}
+        try:
+            write_session(self.session_path, session, None if items is None else self.text_data.write_bodies)
+        except (OSError, ValueError) as e: # ValueError: a value marshal cannot store
+            print(f"Could not save the session to {self.session_path}: {e}")
+
+    def _restore_session(self, session, error):
+        """Shows the workspace save_session left: its rows at once, then re-reads the files changed since."""
+        if session is None or self.current_folder_path.get(): # Nothing saved, or a folder was opened meanwhile
+            return
+        try:
+            for name, value in session['variables'].items():
+                if name in SESSION_VARIABLES:
+                    getattr(self, name).set(value)
+            folder_path = session['folder']
+            top_item, highlighted_item, search_offset = session['view']
+            items, signatures, bodies = session['items'], session['signatures'], session.get('bodies')
+        except (KeyError, TypeError, ValueError, tk.TclError) as e:
+            print(f"Ignoring the saved session {self.session_path}: {e}")
+            return
+        if not folder_path:
+            return
+        if not os.path.isdir(folder_path):
+            self.status_var.set(f"The folder of the last session is no longer there: {folder_path}")
+            return
+        self.current_folder_path.set(folder_path)
+        try:
+            text_data = None if items is None else TextItemStore.from_snapshot(items, out_of_core=self.out_of_core_var.get(),
+                                                                               bodies=bodies)
+        except (TypeError, ValueError) as e:
+            print(f"Ignoring the rows of the saved session {self.session_path}: {e}")
+            text_data = None
+        if text_data is None:
+            self.load_files_from_folder(folder_path)
+            return
+
+        self._open_journal(folder_path) # A replayed file then differs from its saved signature and is re-read
+        self._restart_watcher(folder_path) # Changes from now on; _check_session_files covers those made before
+        self.text_data = text_data
+        self.search_index = TrigramIndex()
+        for _, item_count in text_data.file_ranges.values():
+            self.search_index.add_file(None, item_count) # Postings are filled in by _check_session_files
+        self.item_filter = ItemFilter(text_data, folder_path)
+        self._file_signatures = {filepath: signature for filepath, signature in signatures.items() if signature is not None}
+        self._load_complete = True
+        self._item_count_for_status = len(text_data)
+        item_count = len(text_data)
+        self.list_view.highlighted_item = highlighted_item if highlighted_item is not None and highlighted_item < item_count else None
+        if search_offset is not None and search_offset[0] < item_count:
+            self.last_search_offset = tuple(search_offset)
+            self.last_searched_term_for_find_next = self.search_var.get()
+        top_item = top_item if top_item is not None and top_item < item_count else None
+        if self.filter_var.get():
+            self._restored_top_item = top_item
+            self._apply_filter()
+        else:
+            self.list_view.first_row = top_item or 0
+            self.list_view.refresh()
+        self.status_var.set(f"Restored the last session: {item_count} text items from {len(text_data.file_ranges)} YAML files. "
+                            "Checking for changes on disk...")
+        self._check_session_files(signatures)
+
+    def _check_session_files(self, signatures):
+        """Compares the restored files with the disk off the Tk thread, then re-reads the changed ones.
+
+        Unchanged files get their search postings from the parse cache;
+        changed, added and deleted files go through the watcher's reload path.
+        """
+        folder_path = self.current_folder_path.get()
+        scan_options = dict(include=self.include_var.get() or yaml_text_engine.DEFAULT_INCLUDE_PATTERNS,
+                            exclude=self.exclude_var.get(), recursive=self.recursive_var.get())
+        cache_path = self.parse_cache_path
+        check = self._session_check = object()
+        def work():
+            stale, removed, unchanged = find_stale_files(folder_path, signatures, **scan_options)
+            return stale, removed, cached_trigram_postings(unchanged, cache_path)
+        def done(result, error):
+            if self._session_check is not check: # Another folder was loaded in the meantime
+                return
+            if error is not None:
+                self._session_check = None
+                self.status_var.set(f"Could not compare the restored rows with {folder_path}: {error}")
+                return
+            stale, removed, postings = result
+            self._fill_search_postings(postings)
+            if not stale and not removed:
+                self._session_check = None
+                self.status_var.set(f"Restored the last session: {len(self.text_data)} text items, "
+                                    "no file changed on disk since.")
+                return
+            if any(filepath in self.write_back.dirty for filepath in stale + removed):
+                self.flush_pending_writes() # The reload then reads the edits back along with the other changes
+            self.status_var.set(f"Re-reading {len(stale) + len(removed)} file(s) changed on disk since the last session...")
+            self._session_check, patches = self._start_reload(stale, removed)
+            self._poll_session_reload(self._session_check, patches)
+        self._run_in_background(work, done)
+
+    def _poll_session_reload(self, loader, patches):
+        if self._session_check is not loader: # Cancelled
+            return
+        dialog_open = self._edit_window is not None and self._edit_window.winfo_exists() # It holds an item index
+        if dialog_open or not self._finish_reload(loader, patches):
+            self.master.after(LOAD_POLL_INTERVAL_MS, self._poll_session_reload, loader, patches)
+            return
+        self._session_check = None
+
+    def _cancel_session_check(self):
+        check, self._session_check = self._session_check, None
+        if isinstance(check, BackgroundFolderLoader):
+            check.shutdown()
+
+    def _fill_search_postings(self, postings_by_file):
+        """Gives files indexed without postings (see _restore_session) their trigram postings."""
+        ranges = self.text_data.file_ranges
+        self.search_index.fill_postings({ranges[filepath][0]: trigram_postings
+                                         for filepath, trigram_postings in postings_by_file.items()
+                                         if ranges.get(filepath, (0, 0))[1]}) # Files without items have no postings
+
+    def _restart_watcher(self, folder_path=None):
+        """(Re)starts watching the loaded folder with the current scan settings, if watching is enabled."""
+        self._stop_watcher()
+        folder_path = folder_path or self.current_folder_path.get()
+        if not folder_path or not self.watch_var.get():
+            return
+        self._watcher = FolderWatcher(folder_path, include=self.include_var.get() or yaml_text_engine.DEFAULT_INCLUDE_PATTERNS,
+                                      exclude=self.exclude_var.get(), recursive=self.recursive_var.get()).start()
+        self._watch_after_id = self.master.after(WATCH_CHECK_INTERVAL_MS, self._poll_watcher)
+
+    def _stop_watcher(self):
+        if self._watch_after_id is not None:
+            self.master.after_cancel(self._watch_after_id)
+            self._watch_after_id = None
+        if self._reload_loader is not None:
+            self._reload_loader.shutdown()
+            self._reload_loader = None
+        if self._watcher is not None:
+            self._watcher.stop()
+            self._watcher = None
+
+    def _poll_watcher(self):
+        """Re-reads the files the watcher reported and patches their rows into text_data."""
+        self._watch_after_id = self.master.after(WATCH_CHECK_INTERVAL_MS, self._poll_watcher)
+        if self._folder_loader is not None or self._session_check is not None:
+            return # Changes wait until the full load (or the check of a restored session) is done
+        if self._edit_window is not None and self._edit_window.winfo_exists():
+            return # The dialog holds an item index
+        if self._reload_loader is None:
+            changed, removed = self._watcher.take_changes(self.text_data.file_ranges)
+            pending_edits = [filepath for filepath in changed + removed if filepath in self.write_back.dirty]
+            if pending_edits: # Let the write-back (and its conflict check) go first
+                self._watcher.defer(pending_edits)
+                changed = [filepath for filepath in changed if filepath not in self.write_back.dirty]
+                removed = [filepath for filepath in removed if filepath not in self.write_back.dirty]
+            if not changed and not removed:
+                return
+            self._reload_loader, self._reload_patches = self._start_reload(changed, removed)
+        if self._finish_reload(self._reload_loader, self._reload_patches):
+            self._reload_loader = None
+
+    def _start_reload(self, changed, removed):
+        """Starts re-reading the changed (or added) files in the background.
+
+        Returns (loader, patches) for _finish_reload, patches holding None for each removed file.
+        """
+        loader = BackgroundFolderLoader(changed, cache_path=self.parse_cache_path,
+                                        max_workers=min(len(changed), os.cpu_count() or 1) or 1)
+        return loader, dict.fromkeys(removed)
+
+    def _finish_reload(self, loader, patches):
+        """Collects what loader read so far; once it has read every file, patches them all in and returns True."""
+        while True:
+            result = loader.next_ready()
+            if result is None:
+                break
+            filepath, records, trigram_postings, text_digests, error = result
+            if error: # Often a file caught half-written; its next change event reloads it
+                print(error)
+                continue
+            patches[filepath] = (records, trigram_postings, text_digests)
+        if not loader.finished:
             return False
-        elif isinstance(current_level, dict): # Check if last_key should exist or can be created
-            current_level[last_key] = value_to_set # This will create key if not exists in dict
+        loader.shutdown()
+        for filepath, patch in patches.items():
+            if patch is None:
+                self._file_signatures.pop(filepath, None)
+            else:
+                self._file_signatures[filepath] = loader.file_stats.get(filepath)
+        self._patch_files(patches)
+        # Files whose rows were already right keep them, but may still lack postings after a restored session
+        self._fill_search_postings({filepath: patch[1] for filepath, patch in patches.items() if patch is not None})
+        return True
+
+    def _patch_files(self, patches):
+        """Swaps the rows of whole files in text_data, keeping scroll position and search state.
+
+        patches maps filepath -> (records, trigram postings, text digests) for
+        changed or added files and -> None for deleted ones.
+        """
+        folder_path = self.current_folder_path.get()
+        changes = self.text_data.replace_files(patches, lambda filepath: scan_order_key(folder_path, filepath))
+        if not changes:
+            return
+        self.search_index.replace_files(changes)
+        self.item_filter.invalidate()
+        self._item_count_for_status = len(self.text_data)
+        remap = item_index_mapper(changes)
+        if self.list_view.row_items is None:
+            self.list_view.first_row = remap(self.list_view.first_row)[0]
+        if self.list_view.highlighted_item is not None:
+            row, replaced = remap(self.list_view.highlighted_item)
+            self.list_view.highlighted_item = None if replaced else row
+        if self.current_search_result is not None:
+            item_idx, replaced = remap(self.current_search_result[0])
+            self.current_search_result = None if replaced else (item_idx, *self.current_search_result[1:])
+        item_idx, replaced = remap(self.last_search_offset[0])
+        self.last_search_offset = (item_idx, 0 if replaced else self.last_search_offset[1])
+        self.list_view.refresh()
+        self.status_var.set(f"Updated the rows of {len(changes)} changed, added or deleted file(s). "
+                            f"{self._item_count_for_status} text items.")
+        if self.list_view.row_items is not None: # Old row items point at shifted indices
+            self._apply_filter(keep_position=True)
+
+    def _schedule_write_back(self):
+        """Marks pending edits and (re)starts the debounce timer that writes them."""
+        if self._write_back_after_id is not None:
+            self.master.after_cancel(self._write_back_after_id)
+        self._write_back_after_id = self.master.after(WRITE_BACK_DELAY_MS, self.flush_pending_writes)
+        self.write_now_button.config(state=tk.NORMAL)
+
+    @PROFILER.timed("write pending edits")
+    def flush_pending_writes(self):
+        """Writes every file with pending edits. Returns False if any could not be written."""
+        if self._write_back_after_id is not None:
+            self.master.after_cancel(self._write_back_after_id)
+            self._write_back_after_id = None
+        if not self.write_back.dirty:
             return True
-        return False
+        dirty = list(self.write_back.dirty)
+        failures = self.write_back.flush()
+        failed = {filepath for filepath, _ in failures}
+        self._mark_written([filepath for filepath in dirty if filepath not in failed])
+        file_count = len(dirty)
+        if failures:
+            details = "\n".join(f"{os.path.basename(filepath)}: {error}" for filepath, error in failures[:10])
+            messagebox.showerror("File Write Error", f"Could not write {len(failures)} file(s):\n{details}", parent=self.master)
+            self.status_var.set(f"Error writing {len(failures)} of {file_count} file(s). Use 'Write Now' to retry.")
+            return False
+        self.write_now_button.config(state=tk.DISABLED)
+        dumped_count = sum(1 for method in self.write_back.last_commit_methods.values() if method == "dumped")
+        self.status_var.set(f"Wrote pending changes to {file_count} file(s)"
+                            + (f" ({dumped_count} re-formatted by a full rewrite)." if dumped_count else "."))
+        return True
 
-    def on_mouse_press(self, event):
-        current_widget_state = self.text_display_area.cget("state")
-        is_disabled = (current_widget_state == tk.DISABLED)
-        if is_disabled: self.text_display_area.config(state=tk.NORMAL)
-        self.text_display_area.tag_remove("line_highlight", "1.0", tk.END)
+    def _discard_pending_edits(self):
+        """Drops the edits that could not be written, so the journal does not replay them later either."""
+        self._mark_written(list(self.write_back.dirty))
+        self.write_back.discard()
+
+    def _open_journal(self, folder_path):
+        """Opens the edit journal of folder_path and writes the edits a crash kept from reaching its files."""
+        if self.journal is not None:
+            self.journal.close()
+            self.journal = None
         try:
-            line_start_index = self.text_display_area.index(f"@{event.x},{event.y} linestart")
-            line_number = int(line_start_index.split('.')[0])
-            if 1 <= line_number <= len(self.text_data) : 
-                line_end_index = f"{line_number}.end"
-                self.text_display_area.tag_add("line_highlight", line_start_index, line_end_index)
-        except tk.TclError: pass 
-        finally:
-            if is_disabled: self.text_display_area.config(state=tk.DISABLED)
+            self.journal = EditJournal(default_journal_path(folder_path))
+        except OSError as e:
+            print(f"Edit journal unavailable, edits cannot be undone: {e}")
+        if self.journal is not None and self.journal.has_pending:
+            try:
+                written, conflicts = replay_journal(self.journal)
+            except (CommitError, OSError, ValueError) as e:
+                messagebox.showerror("Recovery Error", "Edits that had not been written when the program last stopped "
+                                     f"could not be written now: {e}\nThey are tried again the next time this folder is opened.",
+                                     parent=self.master)
+            else:
+                if written or conflicts:
+                    message = f"Wrote {written} edit(s) that had not reached the disk when the program last stopped."
+                    if conflicts:
+                        details = "\n".join(f"{os.path.basename(filepath)}" + (f" :: {format_key_path(key_path)}" if key_path else "")
+                                            + f": {reason}" for filepath, key_path, reason in conflicts[:10])
+                        message += f"\n\n{len(conflicts)} were left alone:\n{details}"
+                    messagebox.showinfo("Recovered Edits", message, parent=self.master)
+        self._update_undo_buttons()
 
-    def on_double_click(self, event):
+    def _log_edits(self, label, edits_by_file, kind='edit', target=None):
+        """Logs {filepath: [(key_path, old_text, new_text), ...]} in the journal before it is written.
+
+        Returns the operation id, or None if there is no journal or it cannot be written.
+        """
+        if self.journal is None:
+            return None
         try:
-            text_widget_index = self.text_display_area.index(f"@{event.x},{event.y} linestart")
-            line_number = int(text_widget_index.split('.')[0])
-            selected_0_based_index = line_number - 1 
-        except (tk.TclError, ValueError): return 
-        if 0 <= selected_0_based_index < len(self.text_data):
+            op_id = self.journal.record(label, edits_by_file, kind, target)
+        except OSError as e:
+            print(f"Could not log edits in {self.journal.path}: {e}")
+            return None
+        self._update_undo_buttons()
+        return op_id
+
+    def _mark_written(self, filepaths):
+        if self.journal is not None and filepaths:
+            try:
+                self.journal.mark_written(filepaths)
+            except OSError as e: # The edits are replayed at the next start; they are on disk already and left alone
+                print(f"Could not update {self.journal.path}: {e}")
+
+    def _cancel_logged(self, op_id):
+        """Forgets a logged operation whose files were rolled back."""
+        if self.journal is not None and op_id is not None:
+            try:
+                self.journal.cancel(op_id)
+            except OSError as e:
+                print(f"Could not update {self.journal.path}: {e}")
+            self._update_undo_buttons()
+
+    def _update_undo_buttons(self):
+        undo = self.journal.next_undo() if self.journal is not None else None
+        redo = self.journal.next_redo() if self.journal is not None else None
+        self.undo_button.config(state=tk.NORMAL if undo else tk.DISABLED)
+        self.redo_button.config(state=tk.NORMAL if redo else tk.DISABLED)
+
+    def undo_edit(self):
+        """Reverts the latest edit, replace or Replace All of the journal, writing each file it touched once."""
+        step = self.journal.next_undo() if self.journal is not None else None
+        if step is None:
+            self.status_var.set("Nothing to undo.")
+            return
+        self._apply_logged_operation(*step, 'undo')
+
+    def redo_edit(self):
+        """Applies the latest undone operation again."""
+        step = self.journal.next_redo() if self.journal is not None else None
+        if step is None:
+            self.status_var.set("Nothing to redo.")
+            return
+        self._apply_logged_operation(*step, 'redo')
+
+    def _apply_logged_operation(self, op_id, label, kind):
+        """Undoes (kind 'undo') or redoes operation op_id of the journal as one batch per file.
+
+        Only strings that still read what the operation left (or, for redo,
+        what it found) are changed; the others were edited since and are
+        skipped. Like Replace All, every file is written at once or not at all.
+        """
+        if self._folder_loader is not None:
+            self.status_var.set(f"Wait until the folder is loaded to {kind}.")
+            return
+        if self._import_op is not None: # It writes files (and logs their edits) from another thread
+            self.status_var.set(f"Wait until the import is done to {kind}.")
+            return
+        if not self.flush_pending_writes(): # Later edits must be on disk before older ones are reverted
+            return
+        action = "Undo" if kind == 'undo' else "Redo"
+        with PROFILER.span(kind):
+            try:
+                edits_by_file = self.journal.edits(op_id)
+            except (OSError, ValueError) as e:
+                messagebox.showerror(f"{action} Error", f"Cannot read the edit journal: {e}", parent=self.master)
+                return
+            applied = {} # filepath -> [(key_path, text before, text after), ...], as logged for this undo/redo
+            changed_items = [] # (item_index, text before), to roll back in memory on failure
+            skipped = 0
+            for filepath, entries in edits_by_file.items():
+                item_indices = self._key_path_items(filepath)
+                for key_path, old_text, new_text in (reversed(entries) if kind == 'undo' else entries):
+                    expected, text = (new_text, old_text) if kind == 'undo' else (old_text, new_text)
+                    item_idx = item_indices.get(key_path)
+                    if item_idx is None or self.text_data.text(item_idx) != expected:
+                        skipped += 1
+                        continue
+                    try:
+                        self.write_back.set_value(filepath, key_path, text)
+                    except OSError as e_stat:
+                        self._revert_replace_all(changed_items, applied.keys())
+                        messagebox.showerror(f"{action} Error", f"Cannot write to {filepath}: {e_stat}", parent=self.master)
+                        return
+                    applied.setdefault(filepath, []).append((key_path, expected, text))
+                    changed_items.append((item_idx, expected))
+                    self.text_data.set_text(item_idx, text)
+                    self.search_index.update(item_idx, text)
+
+            # Logged even when every string was skipped, so the operation leaves the undo (or redo) list
+            logged = self._log_edits(f"{action} {label}", applied, kind, op_id)
+            if logged is None:
+                self._revert_replace_all(changed_items, applied.keys())
+                messagebox.showerror(f"{action} Error", "The edit journal cannot be written; nothing was changed.", parent=self.master)
+                return
+            if applied:
+                failures = self.write_back.flush(all_or_nothing=True)
+                if failures:
+                    self._cancel_logged(logged)
+                    self._revert_replace_all(changed_items, applied.keys())
+                    details = "\n".join(f"{os.path.basename(filepath)}: {error}" for filepath, error in failures[:10])
+                    messagebox.showerror("File Write Error", f"{action} was rolled back, no file was changed:\n{details}", parent=self.master)
+                    self.status_var.set(f"{action} of {label} failed ({len(failures)} file error(s)).")
+                    return
+                self._mark_written(applied)
+        self.item_filter.invalidate()
+        self.current_search_result = None
+        self.replace_button.config(state=tk.DISABLED)
+        if len(changed_items) == 1:
+            self.list_view.highlighted_item = changed_items[0][0]
+            self.list_view.see(changed_items[0][0])
+        else:
+            self.list_view.refresh()
+        status = f"{'Undid' if kind == 'undo' else 'Redid'} {label}: {len(changed_items)} string(s) in {len(applied)} file(s)."
+        if skipped:
+            status += f" {skipped} string(s) changed since were left alone."
+        self.status_var.set(status)
+
+    def _run_in_background(self, work, on_done):
+        """Runs work() on a thread and calls on_done(result, error) on the Tk thread when it ends."""
+        outcome = {}
+        def run():
+            try: outcome['result'] = work()
+            except Exception as e: outcome['error'] = e
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        def poll():
+            if worker.is_alive():
+                self.master.after(LOAD_POLL_INTERVAL_MS, poll)
+            else:
+                on_done(outcome.get('result'), outcome.get('error'))
+        self.master.after(LOAD_POLL_INTERVAL_MS, poll)
+
+    def export_strings(self):
+        folder_path = self.current_folder_path.get()
+        if not self.text_data:
+            self.status_var.set("No data loaded to export.")
+            return
+        output_path = filedialog.asksaveasfilename(
+            parent=self.master, title="Export Strings", defaultextension=".csv",
+            filetypes=[("CSV (spreadsheets)", "*.csv"), ("JSON Lines", "*.jsonl"), ("XLIFF 1.2 (CAT tools)", "*.xlf *.xliff")])
+        if not output_path:
+            return
+        try:
+            fmt = guess_exchange_format(output_path)
+        except ValueError as e:
+            messagebox.showerror("Export Error", str(e), parent=self.master)
+            return
+        text_data = self.text_data
+        def work():
+            items = text_data.iter_items()
+            with open(output_path, 'w', encoding='utf-8', newline='' if fmt == 'csv' else None) as out:
+                return export_items(items, out, fmt, folder_path)
+        def done(row_count, error):
+            self.export_button.config(state=tk.NORMAL)
+            if error is not None:
+                messagebox.showerror("Export Error", f"Could not export strings: {error}", parent=self.master)
+                self.status_var.set(f"Export failed: {str(error)[:100]}")
+            else:
+                self.status_var.set(f"Exported {row_count} string(s) to {os.path.basename(output_path)}.")
+        self.export_button.config(state=tk.DISABLED)
+        self.status_var.set(f"Exporting {len(text_data)} string(s)...")
+        self._run_in_background(work, done)
+
+    def import_strings(self):
+        folder_path = self.current_folder_path.get()
+        if not folder_path:
+            self.status_var.set("Select a folder before importing translations.")
+            return
+        input_path = filedialog.askopenfilename(
+            parent=self.master, title="Import Translations",
+            filetypes=[("Exported strings", "*.csv *.jsonl *.xlf *.xliff"), ("All files", "*.*")])
+        if not input_path or not self.flush_pending_writes():
+            return
+        # Logged like Replace All, file by file before each is written, so it can be undone and a crash is finished later
+        op_id = self._log_edits(f"import of {os.path.basename(input_path)}", {})
+        if op_id is None:
+            messagebox.showerror("Import Error", "The edit journal cannot be written; nothing was imported.", parent=self.master)
+            return
+        journal = self.journal
+        logged_files = []
+        def log_edits(filepath, entries):
+            journal.add_edits(op_id, {filepath: entries})
+            logged_files.append(filepath)
+        def done(summary, error):
+            self._import_op = None
+            self.import_button.config(state=tk.NORMAL)
+            if self.journal is journal: # Not when another folder was opened meanwhile
+                self._mark_written(logged_files) # Every logged file was written, or its commit failed and was given up
+                if not logged_files:
+                    self._cancel_logged(op_id)
+            if error is not None:
+                messagebox.showerror("Import Error", f"Could not import {os.path.basename(input_path)}: {error}", parent=self.master)
+                self.status_var.set(f"Import failed: {str(error)[:100]}")
+                return
+            message = (f"Applied {summary.applied} translation(s) in {summary.files_written} file(s); "
+                       f"{summary.unchanged} unchanged, {len(summary.conflicts)} skipped.")
+            if summary.conflicts:
+                details = "\n".join(f"{relative_file} :: {key}: {reason}" for relative_file, key, reason in summary.conflicts[:10])
+                messagebox.showwarning("Import", f"{message}\n\nSkipped rows:\n{details}", parent=self.master)
+            if summary.files_written:
+                # Edits saved while importing are written first (the write-back refuses files the import changed
+                # underneath them); ones that fail stay pending rather than being dropped
+                self.flush_pending_writes()
+                self.load_files_from_folder(folder_path)
+            self.status_var.set(message)
+        self._import_op = op_id
+        self.import_button.config(state=tk.DISABLED)
+        self.status_var.set(f"Importing {os.path.basename(input_path)}...")
+        self._run_in_background(lambda: import_translations(input_path, folder_path, log_edits=log_edits), done)
+
+    def open_compare_window(self):
+        """Compares a source-language folder with its translation, string by string (see compare_folder_records)."""
+        compare_window = tk.Toplevel(self.master)
+        compare_window.title("Compare Folders")
+        compare_window.geometry("800x500")
+        source_var = tk.StringVar()
+        target_var = tk.StringVar(value=self.current_folder_path.get()) # The loaded folder is usually the translation
+        shown_status_var = tk.StringVar(value='missing')
+        summary_var = tk.StringVar(value="Choose the source-language folder and the translated folder, then click 'Compare'.")
+        entries_by_status = {status: [] for status in COMPARE_STATUSES}
+        status_buttons = {}
+
+        def browse(folder_var):
+            folder_selected = filedialog.askdirectory(parent=compare_window)
+            if folder_selected:
+                folder_var.set(os.path.normpath(folder_selected))
+
+        folders_frame = tk.Frame(compare_window)
+        folders_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        folders_frame.columnconfigure(1, weight=1)
+        for row, (label, folder_var) in enumerate((("Source:", source_var), ("Translation:", target_var))):
+            tk.Label(folders_frame, text=label).grid(row=row, column=0, sticky=tk.W)
+            tk.Entry(folders_frame, textvariable=folder_var).grid(row=row, column=1, sticky=tk.EW, padx=5)
+            tk.Button(folders_frame, text="Browse...", command=lambda folder_var=folder_var: browse(folder_var)
+                      ).grid(row=row, column=2, pady=2)
+        compare_button = tk.Button(folders_frame, text="Compare")
+        compare_button.grid(row=0, column=3, rowspan=2, padx=(5, 0), sticky=tk.NS)
+
+        status_frame = tk.Frame(compare_window)
+        status_frame.pack(fill=tk.X, padx=10, pady=(5, 0))
+        for status in COMPARE_STATUSES:
+            status_buttons[status] = tk.Radiobutton(status_frame, text=COMPARE_STATUS_LABELS[status], value=status,
+                                                    variable=shown_status_var, command=lambda: show_entries())
+            status_buttons[status].pack(side=tk.LEFT)
+        tk.Label(compare_window, textvariable=summary_var, anchor=tk.W).pack(fill=tk.X, padx=10)
+
+        list_frame = tk.Frame(compare_window)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        list_scrollbar = tk.Scrollbar(list_frame)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        entries_listbox = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, font=("Courier New", 10))
+        entries_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        list_scrollbar.config(command=entries_listbox.yview)
+
+        def show_entries():
+            entries = entries_by_status[shown_status_var.get()]
+            entries_listbox.delete(0, tk.END)
+            for _, relative_path, key_path, source_text, target_text in entries[:COMPARE_LIST_LIMIT]:
+                shown_text = target_text if source_text is None else source_text
+                if target_text is not None and target_text != shown_text:
+                    shown_text += " => " + target_text
+                entries_listbox.insert(tk.END, f"{relative_path} :: {format_key_path(key_path)} :: "
+                                               f"{shown_text.replace(chr(10), ' ')[:2 * yaml_text_engine.TEXT_PREVIEW_CHARS]}")
+            if len(entries) > COMPARE_LIST_LIMIT:
+                entries_listbox.insert(tk.END, f"... and {len(entries) - COMPARE_LIST_LIMIT} more "
+                                               "(use 'yaml_text_engine.py compare' to list them all)")
+
+        def show_selected(event):
+            selection = entries_listbox.curselection()
+            entries = entries_by_status[shown_status_var.get()]
+            if not selection or selection[0] >= len(entries):
+                return
+            status, relative_path, key_path, _, _ = entries[selection[0]]
+            folder_path = source_var.get() if status == 'missing' else target_var.get()
+            item_idx = None
+            if os.path.normpath(folder_path) == self.current_folder_path.get():
+                item_idx = self._item_index(os.path.normpath(os.path.join(folder_path, relative_path)), key_path)
+            if item_idx is None:
+                self.status_var.set(f"'{relative_path} :: {format_key_path(key_path)}' is not in the loaded folder.")
+                return
+            self.list_view.highlighted_item = item_idx
+            if not self.list_view.see(item_idx):
+                self.status_var.set("That text item is hidden by the filter. Clear the filter to show it.")
+                return
+            self.status_var.set(f"Showing '{format_key_path(key_path)}' (line {item_idx + 1}).")
+        entries_listbox.bind("<Double-1>", show_selected)
+
+        def compare():
+            source_folder, target_folder = source_var.get(), target_var.get()
+            for folder_path in (source_folder, target_folder):
+                if not os.path.isdir(folder_path):
+                    messagebox.showerror("Compare Folders", f"Not a folder: {folder_path or '(empty)'}", parent=compare_window)
+                    return
+            scan_options = dict(include=self.include_var.get() or yaml_text_engine.DEFAULT_INCLUDE_PATTERNS,
+                                exclude=self.exclude_var.get(), recursive=self.recursive_var.get())
+            cache_path = self.parse_cache_path
+            def work():
+                failed_files = []
+                def folder_records(folder_path):
+                    for filepath, records, error in iter_folder_records(scan_yaml_files(folder_path, **scan_options), cache_path):
+                        if error:
+                            failed_files.append(filepath)
+                            print(error)
+                        else:
+                            yield filepath, records
+                compared = {status: [] for status in COMPARE_STATUSES}
+                for entry in compare_folder_records(folder_records(source_folder), folder_records(target_folder),
+                                                    source_folder, target_folder):
+                    compared[entry[0]].append(entry)
+                return compared, failed_files
+            def done(result, error):
+                if not compare_window.winfo_exists():
+                    return
+                compare_button.config(state=tk.NORMAL)
+                if error is not None:
+                    summary_var.set(f"Comparison failed: {str(error)[:100]}")
+                    return
+                compared, failed_files = result
+                entries_by_status.update(compared)
+                for status, button in status_buttons.items():
+                    button.config(text=f"{COMPARE_STATUS_LABELS[status]} ({len(compared[status])})")
+                summary = (f"{sum(map(len, compared.values()))} string(s) compared. "
+                           "Double-click a row to show it, if its folder is the one loaded.")
+                if failed_files:
+                    summary += f" {len(failed_files)} file(s) could not be read (see console)."
+                summary_var.set(summary)
+                show_entries()
+            compare_button.config(state=tk.DISABLED)
+            summary_var.set("Comparing...")
+            self._run_in_background(work, done)
+        compare_button.config(command=compare)
+
+    def _key_path_items(self, filepath):
+        """{key_path: item index} of the loaded items of filepath."""
+        first_item_idx, item_count = self.text_data.file_ranges.get(filepath, (0, 0))
+        key_path = self.text_data.key_path
+        return {key_path(item_idx): item_idx for item_idx in range(first_item_idx, first_item_idx + item_count)}
+
+    def _item_index(self, filepath, key_path):
+        """The index of the loaded item at key_path in filepath, or None."""
+        first_item_idx, item_count = self.text_data.file_ranges.get(filepath, (0, 0))
+        for item_idx in range(first_item_idx, first_item_idx + item_count):
+            if self.text_data.key_path(item_idx) == key_path:
+                return item_idx
+        return None
+
+    def on_mouse_press(self, event):
+        item_idx = self.list_view.item_at(event.x, event.y)
+        if item_idx is None: self.list_view.clear_highlight()
+        else: self.list_view.highlight(item_idx)
+
+    def on_double_click(self, event):
+        selected_0_based_index = self.list_view.item_at(event.x, event.y)
+        if selected_0_based_index is not None:
             item_data = self.text_data[selected_0_based_index]
             self.open_edit_dialog(selected_0_based_index, item_data)
 
     def _update_display_line(self, item_0_based_index):
-        current_widget_state = self.text_display_area.cget("state")
-        is_disabled = (current_widget_state == tk.DISABLED)
-        if is_disabled: self.text_display_area.config(state=tk.NORMAL)
-        
-        target_line_1_based = item_0_based_index + 1
-        item_data = self.text_data[item_0_based_index]
-        new_text_value = item_data['original_text']
-        self.text_display_area.delete(f"{target_line_1_based}.0", f"{target_line_1_based + 1}.0") 
-        filename_part = os.path.basename(item_data['filepath'])
-        message_key_part = item_data['message_key']
-        display_text_updated_preview_full = str(new_text_value).replace('\n', ' ').replace('\r', '')
-        preview_updated = display_text_updated_preview_full[:100]
-        if len(display_text_updated_preview_full) > 100: preview_updated += "..."
-        insert_start_pos = f"{target_line_1_based}.0"
-        self.text_display_area.insert(insert_start_pos, filename_part, "filename_color")
-        self.text_display_area.insert(tk.INSERT, " :: ", "separator_color")
-        self.text_display_area.insert(tk.INSERT, message_key_part, "messagekey_color")
-        self.text_display_area.insert(tk.INSERT, " :: ", "separator_color")
-        self._insert_formatted_preview(preview_updated) 
-        self.text_display_area.insert(tk.INSERT, "\n") 
-        if is_disabled: self.text_display_area.config(state=tk.DISABLED)
-
-    def open_edit_dialog(self, item_0_based_index, item_data_at_open):
+        self.list_view.refresh_item(item_0_based_index)
+
+    def open_edit_dialog(self, item_0_based_index, item_data_at_open, apply_to_identical=False):
         edit_window = tk.Toplevel(self.master)
         edit_window.title(f"Edit Text")
         edit_window.geometry("600x400")
         edit_window.transient(self.master) 
         edit_window.grab_set() 
+        self._edit_window = edit_window
         try:
             current_item_data = self.text_data[item_0_based_index]
             current_text_val = current_item_data['original_text']
@@ -362,7 +1344,7 @@ class YamlTextEditorApp:
             edit_window.destroy()
             return
             
-        tk.Label(edit_window, text=f"File: {os.path.basename(current_item_data['filepath'])}\nKey Path: {current_item_data['message_key']}", 
+        tk.Label(edit_window, text=f"File: {self._display_filename(current_item_data['filepath'])}\nKey Path: {current_item_data['message_key']}", 
                  justify=tk.LEFT, pady=10).pack(anchor=tk.W, padx=10)
         text_widget_editor = scrolledtext.ScrolledText(edit_window, wrap=tk.WORD, height=15, width=70, font=("Arial", 10))
         text_widget_editor.pack(padx=10, pady=5, fill=tk.BOTH, expand=True)
@@ -375,85 +1357,255 @@ class YamlTextEditorApp:
             last_end = end
         if last_end < len(current_text_val): text_widget_editor.insert(tk.END, current_text_val[last_end:])
         text_widget_editor.focus_set()
+        identical_items = self.text_data.identical_items(item_0_based_index)
+        apply_to_identical_var = tk.BooleanVar(value=apply_to_identical and len(identical_items) > 1)
+        if len(identical_items) > 1:
+            tk.Checkbutton(edit_window, text=f"Apply to all {len(identical_items)} identical strings "
+                                             f"(in {len({self.text_data.filepath(item_idx) for item_idx in identical_items})} file(s))",
+                           variable=apply_to_identical_var).pack(anchor=tk.W, padx=10)
         button_frame = tk.Frame(edit_window)
         button_frame.pack(pady=10)
 
+        @PROFILER.timed("save edit")
         def save_changes():
             new_text = text_widget_editor.get("1.0", tk.END).rstrip('\n')
+            if apply_to_identical_var.get():
+                edit_window.destroy()
+                self.edit_identical_items(identical_items, current_text_val, new_text)
+                return
             target_item_data_entry = self.text_data[item_0_based_index]
-            yaml_content = None
-            try:
-                with open(target_item_data_entry['filepath'], 'r', encoding='utf-8') as f:
-                    yaml_content = self.yaml_parser.load(f) # Use ruamel.yaml load
-                if yaml_content is None: # File was empty, comments-only, or '--- null'
-                    yaml_content = self.yaml_parser.map() # Create a new CommentedMap
-            except FileNotFoundError:
-                 messagebox.showerror("Save Error", f"File not found: {target_item_data_entry['filepath']}", parent=edit_window)
-                 return
-            except YAMLError as e_load: # Covers empty file ParserError, malformed YAML
-                 messagebox.showerror("Save Error", f"Cannot load {os.path.basename(target_item_data_entry['filepath'])} to save: {e_load}\nFile might be empty or malformed.", parent=edit_window)
-                 # Optionally, ask user if they want to overwrite with a new structure
-                 # For now, we just error out if re-load fails.
-                 return
-
-            if not self._set_value_by_path(yaml_content, target_item_data_entry['message_key'], new_text):
-                messagebox.showerror("Save Error", f"Failed to update value for '{target_item_data_entry['message_key']}'. Path might be incorrect.", parent=edit_window)
+            if new_text == target_item_data_entry['original_text']:
+                self.status_var.set("The text was not changed.")
+                edit_window.destroy()
+                return
+            # Logged before anything can reach the file, see EditJournal
+            op_id = self._log_edits(f"edit of '{target_item_data_entry['message_key']}'", {target_item_data_entry['filepath']: [
+                (target_item_data_entry['key_path'], target_item_data_entry['original_text'], new_text)]})
+            if op_id is None:
+                messagebox.showerror("Save Error", "The edit journal cannot be written; the change was not saved.", parent=edit_window)
                 return
-
             try:
-                with open(target_item_data_entry['filepath'], 'w', encoding='utf-8') as f:
-                    self.yaml_parser.dump(yaml_content, f) # Use ruamel.yaml dump
-                target_item_data_entry['original_text'] = new_text 
-                self._update_display_line(item_0_based_index)
-                target_line_1_based = item_0_based_index + 1
-                current_widget_state = self.text_display_area.cget("state")
-                is_disabled = (current_widget_state == tk.DISABLED)
-                if is_disabled: self.text_display_area.config(state=tk.NORMAL)
-                self.text_display_area.tag_remove("line_highlight", "1.0", tk.END)
-                self.text_display_area.tag_add("line_highlight", f"{target_line_1_based}.0", f"{target_line_1_based}.end")
-                self.text_display_area.see(f"{target_line_1_based}.0")
-                if is_disabled: self.text_display_area.config(state=tk.DISABLED)
-                self.status_var.set(f"Saved changes to '{target_item_data_entry['message_key']}' in {os.path.basename(target_item_data_entry['filepath'])}")
-                edit_window.destroy()
-            except Exception as e_save:
-                messagebox.showerror("Save Error", f"Could not save changes to file: {e_save}", parent=edit_window)
-                self.status_var.set(f"Error saving: {str(e_save)[:100]}")
+                # Only recorded here; the file is patched (or re-dumped) by the next write-back
+                self.write_back.set_value(target_item_data_entry['filepath'], target_item_data_entry['key_path'], new_text)
+            except OSError as e_stat:
+                 self._cancel_logged(op_id)
+                 messagebox.showerror("Save Error", f"Cannot save to {target_item_data_entry['filepath']}: {e_stat}", parent=edit_window)
+                 return
+            self._schedule_write_back()
+            target_item_data_entry['original_text'] = new_text 
+            self.search_index.update(item_0_based_index, new_text)
+            self.item_filter.invalidate() # The row stays shown until the filter changes
+            self.list_view.highlighted_item = item_0_based_index
+            self.list_view.see(item_0_based_index)
+            self.status_var.set(f"Saved changes to '{target_item_data_entry['message_key']}' in {os.path.basename(target_item_data_entry['filepath'])}")
+            edit_window.destroy()
 
         save_button = tk.Button(button_frame, text="Save", command=save_changes, width=10)
         save_button.pack(side=tk.LEFT, padx=5)
         cancel_button = tk.Button(button_frame, text="Cancel", command=edit_window.destroy, width=10)
         cancel_button.pack(side=tk.LEFT, padx=5)
 
+    def edit_identical_items(self, item_indices, old_text, new_text):
+        """Sets every item of item_indices that still reads old_text to new_text, writing each file once."""
+        if new_text == old_text:
+            self.status_var.set("The text was not changed.")
+            return
+        self._replace_in_items(item_indices, lambda text: (new_text, 1) if text == old_text else (text, 0),
+                               "Group Edit", f"'{old_text[:40]}'")
+
+    def open_duplicates_window(self):
+        """Lists the texts that occur more than once; double-click one to edit all of its occurrences at once."""
+        if not self.text_data:
+            self.status_var.set("No data loaded to look for duplicates in.")
+            return
+        groups = sorted(self.text_data.duplicate_groups().values(), key=len, reverse=True)
+        if not groups:
+            self.status_var.set("Every loaded text is unique.")
+            return
+        duplicates_window = tk.Toplevel(self.master)
+        duplicates_window.title("Duplicate Strings")
+        duplicates_window.geometry("700x400")
+        duplicates_window.transient(self.master)
+        shown_groups = groups[:LIST_MATCHES_LIMIT]
+        summary = f"{len(groups)} text(s) occur more than once, {sum(map(len, groups))} time(s) in all."
+        if len(groups) > len(shown_groups):
+            summary += f" Showing the {len(shown_groups)} most frequent."
+        tk.Label(duplicates_window, text=summary + " Double-click one to edit every occurrence at once.",
+                 anchor=tk.W).pack(fill=tk.X, padx=10, pady=(10, 0))
+        list_frame = tk.Frame(duplicates_window)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        list_scrollbar = tk.Scrollbar(list_frame)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        groups_listbox = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, font=("Courier New", 10))
+        groups_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        list_scrollbar.config(command=groups_listbox.yview)
+        for group in shown_groups:
+            preview = self.text_data.preview(group[0]).replace('\n', ' ')[:yaml_text_engine.TEXT_PREVIEW_CHARS]
+            groups_listbox.insert(tk.END, f"{len(group):>6}x  {preview}")
+
+        def edit_selected(event):
+            selection = groups_listbox.curselection()
+            if not selection: return
+            first_item_idx = shown_groups[selection[0]][0]
+            duplicates_window.destroy() # Its counts are stale once the group is edited
+            self.list_view.highlighted_item = first_item_idx
+            self.list_view.see(first_item_idx)
+            self.open_edit_dialog(first_item_idx, self.text_data[first_item_idx], apply_to_identical=True)
+        groups_listbox.bind("<Double-1>", edit_selected)
+
+    def _search_pattern(self, search_term):
+        """The compiled pattern for search_term with the current options, or None (reported
+        in the status bar) if it is not a valid regular expression."""
+        try:
+            return compile_search_pattern(search_term, self.case_sensitive_var.get(),
+                                          self.regex_var.get(), self.whole_word_var.get())
+        except re.error as e:
+            self.status_var.set(f"Invalid regular expression '{search_term}': {e}")
+            return None
+
+    def _current_search_scope(self):
+        """The SearchScope of the "In Keys"/"In Files" entries; reused while they do not change."""
+        scope_key = (self.current_folder_path.get(), self.scope_keys_var.get(), self.scope_files_var.get())
+        if self._search_scope[0] != scope_key:
+            self._search_scope = (scope_key, SearchScope(*scope_key))
+        return self._search_scope[1]
+
+    def _search_candidates(self, search_term):
+        """Sorted indices of the items a search for search_term has to look at: narrowed
+        by the trigram index (literal terms only), the rows the filter shows and the key/file scope."""
+        scope = self._current_search_scope()
+        regex = self.regex_var.get()
+        shown_items = self.list_view.row_items
+        cache_key = (search_term, regex, scope.key_patterns, scope.file_patterns, self.search_index.generation,
+                     None if shown_items is None else (id(shown_items), len(shown_items)))
+        cached_key, candidates = self._search_candidates_cache
+        if cached_key != cache_key:
+            candidates = self._shown_candidates(range(len(self.text_data)) if regex else self.search_index.candidates(search_term))
+            if scope:
+                candidates = list(scope.filter_items(self.text_data, candidates))
+            self._search_candidates_cache = (cache_key, candidates)
+        return candidates
+
+    def _shown_candidates(self, candidates):
+        """candidates (sorted item indices, or a range of all of them) narrowed to the rows the filter shows."""
+        shown_items = self.list_view.row_items
+        if shown_items is None:
+            return candidates
+        if isinstance(candidates, range):
+            return shown_items[:]
+        shown = set(shown_items)
+        return [item_idx for item_idx in candidates if item_idx in shown]
+
+    def _replace_target_description(self):
+        """Where Replace All and the glossary replace, as their confirmation dialogs say it."""
+        shown_items = self.list_view.row_items
+        where = "in all loaded files" if shown_items is None else f"in the {len(shown_items)} row(s) the filter shows"
+        return where + (" (in scope)" if self._current_search_scope() else "")
+
+    def _iter_matching_items(self, search_term, pattern):
+        """Yields (item_index, match_count) for every item in scope that pattern matches."""
+        for item_idx in self._search_candidates(search_term):
+            match_count = len(pattern.findall(self.text_data.text(item_idx)))
+            if match_count:
+                yield item_idx, match_count
+
+    @PROFILER.timed("count matches")
+    def count_matches(self):
+        search_term = self.search_var.get()
+        if not search_term:
+            self.status_var.set("Search term is empty.")
+            return
+        pattern = self._search_pattern(search_term)
+        if pattern is None:
+            return
+        total_matches = item_count = 0
+        for _, match_count in self._iter_matching_items(search_term, pattern):
+            total_matches += match_count
+            item_count += 1
+        self.status_var.set(f"'{search_term}': {total_matches} match(es) in {item_count} text item(s).")
+
+    @PROFILER.timed("list all matches")
+    def list_all_matches(self):
+        search_term = self.search_var.get()
+        if not search_term:
+            self.status_var.set("Search term is empty.")
+            return
+        pattern = self._search_pattern(search_term)
+        if pattern is None:
+            return
+        matching_items = []
+        total_matches = 0
+        for item_idx, match_count in self._iter_matching_items(search_term, pattern):
+            total_matches += match_count
+            matching_items.append(item_idx)
+        if not matching_items:
+            self.status_var.set(f"'{search_term}' not found.")
+            return
+
+        list_window = tk.Toplevel(self.master)
+        list_window.title(f"Matches for '{search_term}'")
+        list_window.geometry("700x400")
+        list_window.transient(self.master)
+        shown_items = matching_items[:LIST_MATCHES_LIMIT]
+        summary = f"{total_matches} match(es) in {len(matching_items)} text item(s)."
+        if len(matching_items) > len(shown_items):
+            summary += f" Showing the first {len(shown_items)}."
+        tk.Label(list_window, text=summary + " Double-click an entry to show it.", anchor=tk.W).pack(fill=tk.X, padx=10, pady=(10, 0))
+        list_frame = tk.Frame(list_window)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        list_scrollbar = tk.Scrollbar(list_frame)
+        list_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        matches_listbox = tk.Listbox(list_frame, yscrollcommand=list_scrollbar.set, font=("Courier New", 10))
+        matches_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        list_scrollbar.config(command=matches_listbox.yview)
+        for item_idx in shown_items:
+            matches_listbox.insert(tk.END, "".join(self._row_segments(item_idx)[::2]))
+
+        def show_selected(event):
+            selection = matches_listbox.curselection()
+            if not selection: return
+            item_idx = shown_items[selection[0]]
+            self.list_view.highlighted_item = item_idx
+            self.list_view.see(item_idx)
+            self.status_var.set(f"Showing '{self.text_data[item_idx]['message_key']}' (line {item_idx + 1}).")
+        matches_listbox.bind("<Double-1>", show_selected)
+
+    @PROFILER.timed("find next")
     def find_next_text(self, restart_search_if_term_changed=True):
         search_term = self.search_var.get()
         if not search_term:
             self.status_var.set("Search term is empty.")
             self.replace_button.config(state=tk.DISABLED)
             return False
-        current_widget_state = self.text_display_area.cget("state")
-        is_disabled = (current_widget_state == tk.DISABLED)
-        if is_disabled: self.text_display_area.config(state=tk.NORMAL)
-        self.text_display_area.tag_remove("line_highlight", "1.0", tk.END)
+        self.list_view.clear_highlight()
         start_item_idx, start_char_idx_in_item_text = self.last_search_offset
         if restart_search_if_term_changed and search_term != self.last_searched_term_for_find_next:
             start_item_idx, start_char_idx_in_item_text = 0, 0
             self.current_search_result = None 
+        pattern = self._search_pattern(search_term)
+        if pattern is None:
+            self.replace_button.config(state=tk.DISABLED)
+            return False
         self.last_searched_term_for_find_next = search_term
-        flags = 0 if self.case_sensitive_var.get() else re.IGNORECASE
+        candidates = self._search_candidates(search_term)
         try:
-            for i in range(start_item_idx, len(self.text_data)):
+            for i in candidates[bisect.bisect_left(candidates, start_item_idx):]:
                 item_data = self.text_data[i]
-                text_to_search = item_data['original_text']
                 current_item_start_char_idx = start_char_idx_in_item_text if i == start_item_idx else 0
-                match = re.search(re.escape(search_term), text_to_search[current_item_start_char_idx:], flags)
+                if current_item_start_char_idx > len(item_data['original_text']):
+                    continue # Past an empty match at the very end
+                match = pattern.search(item_data['original_text'], current_item_start_char_idx)
                 if match:
-                    actual_match_start_in_original = match.start() + current_item_start_char_idx
-                    actual_match_end_in_original = match.end() + current_item_start_char_idx
+                    actual_match_start_in_original = match.start()
+                    actual_match_end_in_original = match.end()
                     self.current_search_result = (i, actual_match_start_in_original, actual_match_end_in_original)
-                    self.last_search_offset = (i, actual_match_end_in_original) 
+                    # An empty (regex) match must not be found again at the same spot
+                    self.last_search_offset = (i, max(actual_match_end_in_original, current_item_start_char_idx + 1)
+                                               if actual_match_start_in_original == actual_match_end_in_original
+                                               else actual_match_end_in_original)
                     display_line_num = i + 1
-                    self.text_display_area.tag_add("line_highlight", f"{display_line_num}.0", f"{display_line_num}.end")
-                    self.text_display_area.see(f"{display_line_num}.0")
+                    self.list_view.highlighted_item = i
+                    self.list_view.see(i)
                     self.replace_button.config(state=tk.NORMAL)
                     self.status_var.set(f"Found '{search_term}' in '{item_data['message_key']}' (line {display_line_num}).")
                     return True 
@@ -471,9 +1623,9 @@ class YamlTextEditorApp:
             self.last_search_offset = (0,0) 
             return False
         finally:
-            if is_disabled: self.text_display_area.config(state=tk.DISABLED)
             if hasattr(self, '_find_next_wrapped'): del self._find_next_wrapped
 
+    @PROFILER.timed("replace")
     def replace_text(self):
         if self.current_search_result is None:
             self.status_var.set("No active search match. Use 'Find Next' first.")
@@ -482,37 +1634,44 @@ class YamlTextEditorApp:
         item_idx, match_start, match_end = self.current_search_result
         item_data = self.text_data[item_idx]
         old_text = item_data['original_text']
-        new_text = old_text[:match_start] + replace_term + old_text[match_end:]
-        
-        yaml_content = None
-        try:
-            with open(item_data['filepath'], 'r', encoding='utf-8') as f:
-                yaml_content = self.yaml_parser.load(f) # Use ruamel.yaml load
-            if yaml_content is None: yaml_content = self.yaml_parser.map()
-        except FileNotFoundError:
-            messagebox.showerror("Replace Error", f"File not found: {item_data['filepath']}")
+        pattern = self._search_pattern(search_term)
+        if pattern is None:
             return
-        except YAMLError as e_load:
-            messagebox.showerror("Replace Error", f"Cannot load {os.path.basename(item_data['filepath'])} to replace: {e_load}")
-            return
-
-        if not self._set_value_by_path(yaml_content, item_data['message_key'], new_text):
-            messagebox.showerror("Save Error", f"Failed to update value for '{item_data['message_key']}'.")
-            self.status_var.set(f"Error: Could not set value for '{item_data['message_key']}'.")
+        match = pattern.match(old_text, match_start)
+        if match is None or match.end() != match_end: # Text or options changed since Find Next
+            self.current_search_result = None
+            self.replace_button.config(state=tk.DISABLED)
+            self.status_var.set("The match changed since it was found. Use 'Find Next' again.")
             return
         try:
-            with open(item_data['filepath'], 'w', encoding='utf-8') as f:
-                self.yaml_parser.dump(yaml_content, f) # Use ruamel.yaml dump
-            item_data['original_text'] = new_text
-            self._update_display_line(item_idx) 
-            self.status_var.set(f"Replaced in '{item_data['message_key']}'. Finding next...")
-            self.last_search_offset = (item_idx, match_start + len(replace_term))
-            self.current_search_result = None 
-            self.replace_button.config(state=tk.DISABLED) 
-            self.find_next_text(restart_search_if_term_changed=False) 
-        except Exception as e_save:
-            messagebox.showerror("Replace Error", f"Could not replace text in file: {e_save}")
-            self.status_var.set(f"Error during replace: {str(e_save)[:100]}")
+            replacement_text = match.expand(replace_term) if self.regex_var.get() else replace_term
+        except re.error as e:
+            messagebox.showerror("Replace Error", f"Invalid replacement '{replace_term}': {e}", parent=self.master)
+            return
+        new_text = old_text[:match_start] + replacement_text + old_text[match_end:]
+        
+        if new_text != old_text:
+            # Logged before anything can reach the file, see EditJournal
+            op_id = self._log_edits(f"replace in '{item_data['message_key']}'", {item_data['filepath']: [(item_data['key_path'], old_text, new_text)]})
+            if op_id is None:
+                messagebox.showerror("Replace Error", "The edit journal cannot be written; nothing was replaced.", parent=self.master)
+                return
+            try:
+                self.write_back.set_value(item_data['filepath'], item_data['key_path'], new_text)
+            except OSError as e_stat:
+                self._cancel_logged(op_id)
+                messagebox.showerror("Replace Error", f"Cannot replace in {item_data['filepath']}: {e_stat}")
+                return
+            self._schedule_write_back()
+        item_data['original_text'] = new_text
+        self.search_index.update(item_idx, new_text)
+        self.item_filter.invalidate()
+        self._update_display_line(item_idx) 
+        self.status_var.set(f"Replaced in '{item_data['message_key']}'. Finding next...")
+        self.last_search_offset = (item_idx, match_start + len(replacement_text) + (match_start == match_end))
+        self.current_search_result = None 
+        self.replace_button.config(state=tk.DISABLED) 
+        self.find_next_text(restart_search_if_term_changed=False) 
 
     def replace_all_text(self):
         search_term, replace_term = self.search_var.get(), self.replace_var.get()
@@ -522,85 +1681,244 @@ class YamlTextEditorApp:
         if not self.text_data:
             self.status_var.set("No data loaded for 'Replace All'.")
             return
+        pattern = self._search_pattern(search_term)
+        if pattern is None:
+            return
+        self._finish_filter_run()
         if not messagebox.askyesno("Confirm Replace All", 
-                               f"Replace all '{search_term}' with '{replace_term}' in all loaded files? This cannot be undone easily.",
-                               parent=self.master):
+                               f"Replace all '{search_term}' with '{replace_term}' {self._replace_target_description()}? "
+                               "'Undo' (Ctrl+Z) reverts it.", parent=self.master):
             self.status_var.set("'Replace All' cancelled.")
             return
+        replacement = search_replacement(replace_term, self.regex_var.get())
+        self._replace_in_items(self._search_candidates(search_term), lambda text: pattern.subn(replacement, text),
+                               "Replace All", f"'{search_term}'")
+
+    def apply_glossary(self):
+        """Replaces every term of a glossary file (term,replacement rows) in one pass per string."""
+        if not self.text_data:
+            self.status_var.set("No data loaded to apply a glossary to.")
+            return
+        glossary_path = filedialog.askopenfilename(
+            parent=self.master, title="Apply Glossary",
+            filetypes=[("Glossary", "*.csv *.tsv *.json"), ("All files", "*.*")])
+        if not glossary_path:
+            return
+        try:
+            pairs = read_glossary(glossary_path)
+        except Exception as e:
+            messagebox.showerror("Glossary Error", f"Could not read {os.path.basename(glossary_path)}: {e}", parent=self.master)
+            return
+        glossary = compile_glossary(pairs, self.case_sensitive_var.get(), self.whole_word_var.get())
+        if not glossary.replacements:
+            self.status_var.set(f"{os.path.basename(glossary_path)} holds no terms.")
+            return
+        self._finish_filter_run()
+        if not messagebox.askyesno("Confirm Glossary",
+                                   f"Replace the {len(glossary.replacements)} term(s) of {os.path.basename(glossary_path)} "
+                                   f"{self._replace_target_description()}? 'Undo' (Ctrl+Z) reverts it.", parent=self.master):
+            self.status_var.set("Glossary cancelled.")
+            return
+        candidates = self._shown_candidates(self.search_index.candidates_any(glossary.replacements))
+        scope = self._current_search_scope()
+        if scope:
+            candidates = list(scope.filter_items(self.text_data, candidates))
+        self._replace_in_items(candidates, glossary.subn, "Glossary", "the glossary terms")
 
-        modified_files_content = {} 
+    def _replace_in_items(self, candidates, replace_item, operation, description):
+        """Runs replace_item(text) -> (new_text, count) over the candidate items and writes
+        every changed file at once; everything is rolled back if any file fails."""
+        if not self.flush_pending_writes(): # Replacing re-reads files from disk
+            return
+        with PROFILER.span(operation.lower()):
+            self._replace_candidates(candidates, replace_item, operation, description)
+
+    def _replace_candidates(self, candidates, replace_item, operation, description):
+
+        modified_files = set()
+        changed_items = [] # (item_index, text before the replacement), to undo in memory on failure
+        logged_edits = {} # filepath -> [(key_path, old text, new text), ...] for the journal
         total_replacements_count = 0
-        flags = 0 if self.case_sensitive_var.get() else re.IGNORECASE
 
-        for item_idx, item_data in enumerate(self.text_data):
+        for item_idx in candidates:
+            item_data = self.text_data[item_idx]
             original_doc_text = item_data['original_text']
-            new_doc_text, num_replacements_in_item = re.subn(re.escape(search_term), replace_term, original_doc_text, flags=flags)
+            try:
+                new_doc_text, num_replacements_in_item = replace_item(original_doc_text)
+            except re.error as e: # Bad group reference in a regex replacement
+                self._revert_replace_all(changed_items, modified_files)
+                messagebox.showerror(f"{operation} Error", f"Invalid replacement: {e}", parent=self.master)
+                return
             if num_replacements_in_item > 0:
+                try:
+                    self.write_back.set_value(item_data['filepath'], item_data['key_path'], new_doc_text)
+                except OSError as e_stat:
+                    messagebox.showerror("File Read Error", f"Cannot read {item_data['filepath']}: {e_stat}", parent=self.master)
+                    self.status_var.set(f"Error reading {item_data['filepath']}. Aborting {operation}.")
+                    self._revert_replace_all(changed_items, modified_files)
+                    return
+                modified_files.add(item_data['filepath'])
                 total_replacements_count += num_replacements_in_item
+                changed_items.append((item_idx, original_doc_text))
+                logged_edits.setdefault(item_data['filepath'], []).append((item_data['key_path'], original_doc_text, new_doc_text))
                 item_data['original_text'] = new_doc_text 
-                if item_data['filepath'] not in modified_files_content:
-                    try:
-                        with open(item_data['filepath'], 'r', encoding='utf-8') as f:
-                            content = self.yaml_parser.load(f) # Use ruamel.yaml load
-                            modified_files_content[item_data['filepath']] = content if content is not None else self.yaml_parser.map()
-                    except FileNotFoundError:
-                        messagebox.showerror("File Read Error", f"File not found: {item_data['filepath']}", parent=self.master)
-                        self.status_var.set(f"Error reading {item_data['filepath']}. Aborting Replace All.")
-                        return 
-                    except YAMLError as e_yaml:
-                        messagebox.showerror("File Read Error", f"Could not parse {item_data['filepath']}: {e_yaml}", parent=self.master)
-                        self.status_var.set(f"Error parsing {item_data['filepath']}. Aborting Replace All.")
-                        return
-                    except Exception as e_other: # General fallback
-                        messagebox.showerror("File Read Error", f"Unexpected error reading {item_data['filepath']}: {e_other}", parent=self.master)
-                        self.status_var.set(f"Error reading {item_data['filepath']}. Aborting Replace All.")
-                        return
-
-                if not self._set_value_by_path(modified_files_content[item_data['filepath']], item_data['message_key'], new_doc_text):
-                    messagebox.showerror("Update Error", f"Failed to set path '{item_data['message_key']}' in {item_data['filepath']}.", parent=self.master)
-                    self.status_var.set(f"Error setting path in {item_data['filepath']}. Aborting.")
-                    return 
+                self.search_index.update(item_idx, new_doc_text)
+        self.item_filter.invalidate()
 
         if total_replacements_count > 0:
-            for filepath, yaml_data_to_write in modified_files_content.items():
-                try:
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        self.yaml_parser.dump(yaml_data_to_write, f) # Use ruamel.yaml dump
-                except Exception as e_write:
-                    messagebox.showerror("File Write Error", f"Could not write changes to {filepath}: {e_write}", parent=self.master)
-                    self.status_var.set(f"Error writing {filepath}. Some files may not be updated.")
+            # Logged before any file is written: a crash while writing is then finished at the next start
+            op_id = self._log_edits(f"{operation} of {description}", logged_edits)
+            if op_id is None:
+                self._revert_replace_all(changed_items, modified_files)
+                messagebox.showerror(f"{operation} Error", "The edit journal cannot be written; no file was changed.", parent=self.master)
+                self.status_var.set(f"{operation} cancelled, the edit journal cannot be written.")
+                return
+            failures = self.write_back.flush(all_or_nothing=True)
+            if failures:
+                self._cancel_logged(op_id)
+                self._revert_replace_all(changed_items, modified_files)
+                details = "\n".join(f"{os.path.basename(filepath)}: {error}" for filepath, error in failures[:10])
+                messagebox.showerror("File Write Error", f"{operation} was rolled back, no file was changed:\n{details}", parent=self.master)
+                self.status_var.set(f"{operation} failed and was rolled back ({len(failures)} file error(s)).")
+                return
+            self._mark_written(modified_files)
+            timings = self.write_back.last_commit_timings # Per-file spans are in PROFILER as "write file"
+            slowest = max(timings, key=timings.get)
             
-            # Reload display area with modified text_data
-            current_widget_state = self.text_display_area.cget("state")
-            is_disabled = (current_widget_state == tk.DISABLED)
-            if is_disabled: self.text_display_area.config(state=tk.NORMAL)
-            self.text_display_area.delete("1.0", tk.END) 
-            self._item_count_for_status = 0 
-            for item_data_reloaded in self.text_data: # self.text_data was updated in-place
-                filename = os.path.basename(item_data_reloaded['filepath'])
-                message_key_path = item_data_reloaded['message_key']
-                value = item_data_reloaded['original_text']
-                display_text_preview_full = str(value).replace('\n', ' ').replace('\r', '')
-                self.text_display_area.insert(tk.END, filename, "filename_color")
-                self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                self.text_display_area.insert(tk.END, message_key_path, "messagekey_color")
-                self.text_display_area.insert(tk.END, " :: ", "separator_color")
-                preview = display_text_preview_full[:100]
-                if len(display_text_preview_full) > 100: preview += "..."
-                self._insert_formatted_preview(preview) 
-                self.text_display_area.insert(tk.END, "\n")
-                self._item_count_for_status +=1
-            if is_disabled: self.text_display_area.config(state=tk.DISABLED)
+            # self.text_data was updated in-place; redraw the visible rows
+            self.list_view.highlighted_item = None
+            self.list_view.refresh()
             
-            self.status_var.set(f"Replaced {total_replacements_count} instance(s) across {len(modified_files_content)} file(s). Display updated.")
+            self.status_var.set(f"Replaced {total_replacements_count} instance(s) across {len(modified_files)} file(s). Display updated. "
+                                f"Slowest write: {os.path.basename(slowest)} ({timings[slowest] * 1000:.0f} ms).")
             self.current_search_result = None
             self.last_search_offset = (0,0)
             self.replace_button.config(state=tk.DISABLED) 
-            self.text_display_area.tag_remove("line_highlight", "1.0", tk.END)
         else:
-            self.status_var.set(f"No occurrences of '{search_term}' found to replace.")
+            self.status_var.set(f"No occurrences of {description} found to replace.")
+
+    def _revert_replace_all(self, changed_items, modified_files):
+        """Restores text_data and drops the half-edited documents after a failed Replace All or glossary."""
+        for item_idx, old_text in changed_items:
+            self.text_data[item_idx]['original_text'] = old_text
+            self.search_index.update(item_idx, old_text)
+        self.item_filter.invalidate()
+        self.write_back.forget(modified_files)
+        self.list_view.refresh()
+
+    def _on_profiled_operation(self, name, seconds):
+        """PROFILER.listener: shows how long the last operation took, next to the status bar."""
+        stats = f"{name}: {seconds * 1000:.1f} ms"
+        if PROFILER.peak_memory is not None:
+            stats += f", peak {PROFILER.peak_memory / 2**20:.0f} MiB"
+        self.stats_var.set(stats)
+        if PROFILER.last_profile is not None and PROFILER.last_profile is not self._shown_profile:
+            self._shown_profile = PROFILER.last_profile
+            print(f"cProfile of '{name}':")
+            PROFILER.last_profile[1].sort_stats('cumulative').print_stats(25)
+            self.status_var.set(f"Profiled '{name}': the slowest calls are printed to the console. "
+                                "'Save Profile...' in the stats panel keeps them.")
+
+    def _on_profiling_toggle(self):
+        if self.profiling_var.get():
+            PROFILER.enable(track_memory=self.track_memory_var.get())
+        else:
+            PROFILER.disable()
+            self.stats_var.set("")
+
+    def open_stats_panel(self):
+        """Shows where the time goes: per-operation totals, the slowest files to parse and peak memory."""
+        if self._stats_window is not None and self._stats_window.winfo_exists():
+            self._stats_window.lift()
+            self._refresh_stats_panel()
+            return
+        stats_window = self._stats_window = tk.Toplevel(self.master)
+        stats_window.title("Performance Stats")
+        stats_window.geometry("680x420")
+
+        options_frame = tk.Frame(stats_window)
+        options_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        tk.Checkbutton(options_frame, text="Record timings", variable=self.profiling_var,
+                       command=self._on_profiling_toggle).pack(side=tk.LEFT)
+        tk.Checkbutton(options_frame, text="Track memory (slower)", variable=self.track_memory_var,
+                       command=self._on_profiling_toggle).pack(side=tk.LEFT, padx=(10, 0))
+
+        self._stats_text = scrolledtext.ScrolledText(stats_window, wrap=tk.NONE, font=("Courier New", 9), height=15)
+        self._stats_text.pack(fill=tk.BOTH, expand=True, padx=10, pady=5)
+
+        button_frame = tk.Frame(stats_window)
+        button_frame.pack(fill=tk.X, padx=10, pady=(0, 10))
+        tk.Button(button_frame, text="Refresh", command=self._refresh_stats_panel).pack(side=tk.LEFT)
+        tk.Button(button_frame, text="Reset", command=lambda: (PROFILER.reset(), self._refresh_stats_panel())).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(button_frame, text="Export Trace...", command=self.export_trace).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(button_frame, text="Profile Next Operation", command=self.profile_next_operation).pack(side=tk.LEFT, padx=(5, 0))
+        tk.Button(button_frame, text="Save Profile...", command=self.save_profile).pack(side=tk.LEFT, padx=(5, 0))
+        self._refresh_stats_panel()
+
+    def _refresh_stats_panel(self):
+        lines = []
+        summary = PROFILER.summary()
+        if not summary:
+            lines.append("Nothing recorded yet. Turn on 'Record timings', then load, search, filter or save.")
+        else:
+            lines.append(f"{'Operation':<22}{'Count':>8}{'Total ms':>12}{'Mean ms':>10}{'Longest ms':>12}")
+            for name, count, total, longest in summary:
+                lines.append(f"{name:<22}{count:>8}{total * 1000:>12.1f}{total / count * 1000:>10.2f}{longest * 1000:>12.1f}")
+        slowest_files = PROFILER.slowest_files(STATS_SLOWEST_FILES)
+        if slowest_files:
+            lines += ["", "Slowest files to parse (in the parser processes; files read from the parse cache are not listed):"]
+            lines += [f"{seconds * 1000:>10.1f} ms  {self._display_filename(filepath)}" for filepath, seconds in slowest_files]
+        if PROFILER.peak_memory is not None:
+            lines += ["", f"Peak memory of the window process: {PROFILER.peak_memory / 2**20:.1f} MiB"]
+        self._stats_text.config(state=tk.NORMAL)
+        self._stats_text.delete("1.0", tk.END)
+        self._stats_text.insert(tk.END, "\n".join(lines))
+        self._stats_text.config(state=tk.DISABLED)
+
+    def export_trace(self):
+        """Saves the recorded spans as a Chrome trace (open it in chrome://tracing or ui.perfetto.dev)."""
+        if not PROFILER.events:
+            self.status_var.set("No timings recorded to export. Turn on 'Record timings' in the stats panel first.")
+            return
+        trace_path = filedialog.asksaveasfilename(parent=self._stats_window or self.master, title="Export Trace",
+                                                  defaultextension=".json", filetypes=[("Chrome trace", "*.json")])
+        if not trace_path:
+            return
+        try:
+            event_count = PROFILER.export_chrome_trace(trace_path)
+        except OSError as e:
+            messagebox.showerror("Export Error", f"Could not write {trace_path}: {e}", parent=self._stats_window or self.master)
+            return
+        self.status_var.set(f"Exported {event_count} trace event(s) to {os.path.basename(trace_path)}.")
+
+    def profile_next_operation(self):
+        """Runs the next operation (e.g. Find Next or Replace All) under cProfile."""
+        if not self.profiling_var.get():
+            self.profiling_var.set(True)
+            self._on_profiling_toggle()
+        PROFILER.profile_next_operation()
+        self.status_var.set("The next operation will be profiled with cProfile.")
+
+    def save_profile(self):
+        if PROFILER.last_profile is None:
+            self.status_var.set("Nothing was profiled yet. Use 'Profile Next Operation' first.")
+            return
+        name, stats = PROFILER.last_profile
+        profile_path = filedialog.asksaveasfilename(parent=self._stats_window or self.master, title=f"Save Profile of '{name}'",
+                                                    defaultextension=".prof", filetypes=[("cProfile stats", "*.prof")])
+        if not profile_path:
+            return
+        try:
+            stats.dump_stats(profile_path)
+        except OSError as e:
+            messagebox.showerror("Save Error", f"Could not write {profile_path}: {e}", parent=self._stats_window or self.master)
+            return
+        self.status_var.set(f"Saved the profile of '{name}' to {os.path.basename(profile_path)} (open it with pstats or snakeviz).")
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support() # Worker processes of frozen builds must not start the GUI
+    if len(sys.argv) > 1: # Headless mode, e.g. "extract --jsonl <folder>"; see yaml_text_engine.py
+        sys.exit(yaml_text_engine.main())
     root = tk.Tk()
     try:
         app = YamlTextEditorApp(root)
@@ -612,4 +1930,5 @@ if __name__ == "__main__":
         messagebox.showerror("Initialization Error", f"An error occurred during application startup: {e}")
         root.destroy()
         exit()
+    root.protocol("WM_DELETE_WINDOW", app.on_close)
     root.mainloop()
@@ -0,0 +1,143 @@
+"""Writes a reproducible synthetic folder of YAML files for the benchmarks.
+
+    python benchmarks/generate_corpus.py <output folder> --files 500 --strings-per-file 200 --seed 1
+
+The same options and seed always produce byte-for-byte the same corpus. Files
+mix every scalar style the editor has to handle (plain, quoted, literal and
+folded blocks), lists, nested mappings, non-string values and, with
+--symbol-density, the control codes that SYMBOL_REGEX highlights.
+"""
+import os
+import sys
+import json
+import random
+import argparse
+
+WORDS = ("the quick brown fox jumps over a lazy dog while hero knight potion sword shield village castle "
+         "dragon forest gold silver quest reward enemy battle magic spell friend journey open close save "
+         "load menu item equip status party skill attack defend escape victory defeat").split()
+SYMBOLS = ("\\c[2]", "\\c[0]", "\\n[1]", "\\N[3]", "\\V[12]", "\\!", "\\{", "\\}", "<br>", "\\aub[4]",
+           "\\kel", "\\her12", "\\Com[7]", "\\mar[2]", "\\SINV[1]", "<>", "\\\\")
+COMMON_TEXTS = ("Yes", "No", "OK", "Cancel", "Back", "Save", "Load", "Continue?", "Not enough gold.",
+                "You can't use that here.", "Item obtained!", "\\c[2]Warning\\c[0]: the door is locked.")
+_PLAIN_SAFE = set("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ ")
+
+def make_text(rng, mean_length, symbol_density, multiline_ratio):
+    """A sentence of roughly mean_length characters; each word is followed by a symbol with probability symbol_density."""
+    target = max(1, int(rng.uniform(0.5, 1.5) * mean_length))
+    words = []
+    length = 0
+    while length < target:
+        word = rng.choice(WORDS)
+        if rng.random() < symbol_density:
+            word += rng.choice(SYMBOLS)
+        words.append(word)
+        length += len(word) + 1
+    text = " ".join(words)
+    if rng.random() < multiline_ratio:
+        middle = len(words) // 2
+        text = " ".join(words[:middle]) + "\n" + " ".join(words[middle:])
+    return text[:1].upper() + text[1:]
+
+def _scalar(text, rng, indent):
+    """Renders text as a YAML scalar value (the part after 'key: ' or '- ')."""
+    if "\n" in text:
+        style = rng.choice("|>")
+        if style == ">":
+            text = text.replace("\n", "\n\n") # Folded blocks need a blank line to keep a line break
+        body = "\n".join(" " * (indent + 2) + line if line else "" for line in text.split("\n"))
+        return f"{style}\n{body}"
+    if set(text) <= _PLAIN_SAFE and text == text.strip() and rng.random() < 0.4:
+        return text
+    if "'" not in text and rng.random() < 0.5:
+        return f"'{text}'"
+    return json.dumps(text, ensure_ascii=False) # A valid YAML double-quoted scalar
+
+class _Writer:
+    def __init__(self, rng, options):
+        self.rng = rng
+        self.options = options
+        self.lines = []
+        self.strings = 0
+
+    def text(self):
+        options = self.options
+        self.strings += 1
+        if self.rng.random() < options.duplicate_ratio:
+            return self.rng.choice(COMMON_TEXTS)
+        return make_text(self.rng, options.string_length, options.symbol_density, options.multiline_ratio)
+
+    def mapping(self, indent, depth, budget):
+        """Writes mapping entries at indent until budget strings were written."""
+        rng, options = self.rng, self.options
+        start = self.strings
+        key_number = 0
+        while self.strings - start < budget:
+            key = f"{rng.choice(WORDS)}_{key_number}"
+            key_number += 1
+            prefix = " " * indent
+            choice = rng.random()
+            if depth < options.depth and choice < 0.25:
+                self.lines.append(f"{prefix}{key}:")
+                self.mapping(indent + 2, depth + 1, min(budget - (self.strings - start), rng.randint(1, options.list_size * 2)))
+            elif choice < 0.4:
+                self.lines.append(f"{prefix}{key}:")
+                for _ in range(rng.randint(1, options.list_size)):
+                    self.lines.append(f"{prefix}  - {_scalar(self.text(), rng, indent + 2)}")
+            elif choice < 0.45:
+                self.lines.append(f"{prefix}{key}: {rng.choice(('123', 'true', '4.5', 'null', '2024-01-31'))}")
+            else:
+                self.lines.append(f"{prefix}{key}: {_scalar(self.text(), rng, indent)}")
+
+def generate_corpus(output_folder, options):
+    """Writes the corpus described by options (see build_arg_parser) and returns a summary dict."""
+    rng = random.Random(options.seed)
+    total_strings = total_bytes = 0
+    for file_number in range(options.files):
+        subfolder = os.path.join(output_folder, f"part{file_number % options.subfolders:03d}") if options.subfolders else output_folder
+        os.makedirs(subfolder, exist_ok=True)
+        writer = _Writer(rng, options)
+        for document_number in range(options.documents):
+            if options.documents > 1:
+                writer.lines.append("---")
+            writer.lines.append(f"# Synthetic file {file_number}, document {document_number}")
+            writer.mapping(0, 1, max(1, options.strings_per_file // options.documents))
+        content = "\n".join(writer.lines) + "\n"
+        with open(os.path.join(subfolder, f"file{file_number:05d}.yaml"), "w", encoding="utf-8", newline="\n") as f:
+            f.write(content)
+        total_strings += writer.strings
+        total_bytes += len(content.encode("utf-8"))
+    return {"files": options.files, "strings": total_strings, "bytes": total_bytes,
+            "options": {name: getattr(options, name) for name in CORPUS_OPTIONS}}
+
+CORPUS_OPTIONS = ("files", "strings_per_file", "depth", "list_size", "string_length", "symbol_density",
+                  "multiline_ratio", "duplicate_ratio", "documents", "subfolders", "seed")
+
+def add_corpus_arguments(parser):
+    """Adds the options that shape the corpus (CORPUS_OPTIONS) to an argparse parser."""
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--strings-per-file", type=int, default=200)
+    parser.add_argument("--depth", type=int, default=3, help="maximum nesting of mappings")
+    parser.add_argument("--list-size", type=int, default=5, help="maximum strings per list")
+    parser.add_argument("--string-length", type=int, default=60, help="mean characters per string")
+    parser.add_argument("--symbol-density", type=float, default=0.05, help="chance of a control code after each word")
+    parser.add_argument("--multiline-ratio", type=float, default=0.05, help="share of strings with a line break")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.05, help="share of strings repeating a common UI text")
+    parser.add_argument("--documents", type=int, default=1, help="YAML documents per file")
+    parser.add_argument("--subfolders", type=int, default=10, help="spread files over this many subfolders (0: none)")
+    parser.add_argument("--seed", type=int, default=1)
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Write a synthetic folder of YAML files for benchmarking.")
+    parser.add_argument("output_folder")
+    add_corpus_arguments(parser)
+    return parser
+
+def main(argv=None):
+    options = build_arg_parser().parse_args(argv)
+    summary = generate_corpus(options.output_folder, options)
+    print(json.dumps(summary))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,260 @@
+"""Headless benchmarks of the editor's hot paths, written as JSON so versions can be compared.
+
+    python benchmarks/run_benchmarks.py --output results.json
+    python benchmarks/run_benchmarks.py --corpus my_game/data --compare results.json
+
+Without --corpus a synthetic corpus is generated (see generate_corpus.py; its
+options are accepted here too). Timed, each --repeat times:
+
+  load_cold / load_cached  folder extraction as the window does it (BackgroundFolderLoader
+                           into a TextItemStore and TrigramIndex), without and with a parse cache
+  find_next                stepping through every match of --term like repeated Find Next
+  filter                   the filter box narrowing the list to --term
+  symbol_segments          splitting every preview into symbol/text segments (needs tkinter)
+  replace_all              Replace All of --term on a copy of the corpus
+  edit_save                --edits single-string edits, each saved on its own
+
+Files are only ever written in a temporary copy of the corpus.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+import importlib.util
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+import yaml_text_engine
+from yaml_text_engine import (BackgroundFolderLoader, DocumentWriteBack, ItemFilter, TextItemStore, TrigramIndex,
+                              compile_search_pattern, make_round_trip_parser, scan_yaml_files, search_replacement)
+import generate_corpus
+
+RESULTS_FORMAT_VERSION = 1
+
+def load_gui_module():
+    """The GUI script as a module (its name has dashes), or None where tkinter is missing."""
+    try:
+        spec = importlib.util.spec_from_file_location("yaml_text_viewer_editor", os.path.join(REPO_DIR, "Yaml-Text-Viewer-Editor.py"))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+    except ImportError:
+        return None
+
+def load_folder(folder_path, cache_path=None):
+    """Loads folder_path the way the window's _poll_folder_loader does; returns (store, index)."""
+    store, index = TextItemStore(), TrigramIndex()
+    loader = BackgroundFolderLoader(scan_yaml_files(folder_path), cache_path=cache_path)
+    try:
+        while True:
+            result = loader.next_ready(block=True, timeout=0.1)
+            if result is not None:
+                filepath, records, trigram_postings, text_digests, error = result
+                if error:
+                    raise RuntimeError(error)
+                store.append_file(filepath, records, text_digests)
+                index.add_file(trigram_postings, len(records))
+            elif loader.finished:
+                break
+    finally:
+        loader.shutdown(wait=True) # Lets the feeder finish updating the cache
+    return store, index
+
+def find_all(store, index, term):
+    """Steps through every match of term as repeated Find Next does; returns the match count."""
+    pattern = compile_search_pattern(term)
+    found = 0
+    for item_idx in index.candidates(term):
+        text = store.text(item_idx)
+        match = pattern.search(text)
+        while match:
+            found += 1
+            match = pattern.search(text, match.end())
+    return found
+
+def filter_items(store, folder_path, term):
+    """Typing term into the filter box, one character at a time; returns the final row count."""
+    item_filter = ItemFilter(store, folder_path)
+    for length in range(1, len(term) + 1):
+        run = item_filter.start(term[:length])
+        run.advance(float('inf'))
+    return len(run.items)
+
+def render_segments(store, symbol_segments):
+    segment_count = 0
+    for item_idx in range(len(store)):
+        segment_count += len(symbol_segments(store.preview(item_idx)))
+    return segment_count // 2
+
+def replace_all(store, term, replacement, folder_from, folder_to):
+    """Replace All over store's items, written to the copy in folder_to; returns the replacement count."""
+    pattern = compile_search_pattern(term)
+    replacement = search_replacement(replacement)
+    write_back = DocumentWriteBack(make_round_trip_parser())
+    total = 0
+    for filepath, key_path, text in store.iter_items():
+        new_text, count = pattern.subn(replacement, text)
+        if count:
+            write_back.set_value(filepath.replace(folder_from, folder_to, 1), key_path, new_text)
+            total += count
+    failures = write_back.flush(all_or_nothing=True)
+    if failures:
+        raise RuntimeError(f"Replace All failed: {failures[0][1]}")
+    return total
+
+def edit_and_save(store, edit_count, seed, folder_from, folder_to):
+    """Saves edit_count random single-string edits one by one; returns the per-edit seconds."""
+    rng = random.Random(seed)
+    write_back = DocumentWriteBack(make_round_trip_parser())
+    seconds = []
+    for item_idx in rng.sample(range(len(store)), min(edit_count, len(store))):
+        filepath = store.filepath(item_idx).replace(folder_from, folder_to, 1)
+        start = time.perf_counter()
+        write_back.set_value(filepath, store.key_path(item_idx), store.text(item_idx) + " (edited)")
+        failures = write_back.flush()
+        seconds.append(time.perf_counter() - start)
+        if failures:
+            raise RuntimeError(f"Saving an edit failed: {failures[0][1]}")
+    return seconds
+
+def timed(repeat, run, setup=None):
+    """Runs setup() (untimed) and run(setup result) repeat times; returns (seconds per run, last result)."""
+    seconds = []
+    result = None
+    for _ in range(repeat):
+        prepared = setup() if setup else None
+        start = time.perf_counter()
+        result = run(prepared)
+        seconds.append(time.perf_counter() - start)
+    return seconds, result
+
+def summarize(seconds, **extra):
+    summary = {"min_s": min(seconds), "median_s": statistics.median(seconds), "runs_s": seconds}
+    summary.update(extra)
+    return summary
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(corpus_path, options, work_dir):
+    copy_path = os.path.join(work_dir, "corpus")
+    def fresh_copy():
+        shutil.rmtree(copy_path, ignore_errors=True)
+        shutil.copytree(corpus_path, copy_path)
+
+    results = {}
+    seconds, (store, index) = timed(options.repeat, lambda _: load_folder(corpus_path))
+    file_count = len(store.file_ranges)
+    results["load_cold"] = summarize(seconds, files=file_count, items=len(store))
+
+    cache_path = os.path.join(work_dir, "parse_cache.sqlite3")
+    load_folder(corpus_path, cache_path) # Fills the cache
+    seconds, _ = timed(options.repeat, lambda _: load_folder(corpus_path, cache_path))
+    results["load_cached"] = summarize(seconds, files=file_count)
+
+    seconds, found = timed(options.repeat, lambda _: find_all(store, index, options.term))
+    results["find_next"] = summarize(seconds, matches=found, per_match_s=min(seconds) / found if found else None)
+
+    seconds, rows = timed(options.repeat, lambda _: filter_items(store, corpus_path, options.term))
+    results["filter"] = summarize(seconds, rows=rows)
+
+    gui = load_gui_module()
+    if gui is None:
+        results["symbol_segments"] = {"skipped": "tkinter is not available"}
+    else:
+        seconds, symbols = timed(options.repeat, lambda _: render_segments(store, gui.symbol_segments))
+        results["symbol_segments"] = summarize(seconds, segments=symbols)
+
+    seconds, replaced = timed(options.repeat, lambda _: replace_all(store, options.term, options.replacement,
+                                                                    corpus_path, copy_path), setup=fresh_copy)
+    results["replace_all"] = summarize(seconds, replacements=replaced)
+
+    fresh_copy()
+    edit_seconds = edit_and_save(store, options.edits, options.seed, corpus_path, copy_path)
+    results["edit_save"] = summarize(edit_seconds, edits=len(edit_seconds),
+                                     p95_s=sorted(edit_seconds)[int(0.95 * (len(edit_seconds) - 1))])
+    store.close()
+    return results
+
+def compare(results, baseline, max_slowdown=None):
+    """Prints current/baseline median ratios; returns the names slower than max_slowdown."""
+    regressions = []
+    print(f"{'benchmark':<18}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, current in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or "median_s" not in current or "median_s" not in before:
+            continue
+        ratio = current["median_s"] / before["median_s"] if before["median_s"] else float('inf')
+        flag = ""
+        if max_slowdown is not None and ratio > max_slowdown:
+            regressions.append(name)
+            flag = "  <-- slower"
+        print(f"{name:<18}{before['median_s'] * 1000:>10.1f}ms{current['median_s'] * 1000:>10.1f}ms{ratio:>8.2f}{flag}")
+    return regressions
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Benchmark loading, searching and saving.")
+    generate_corpus.add_corpus_arguments(parser)
+    parser.add_argument("--corpus", help="benchmark this folder instead of a generated corpus (it is not modified)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per benchmark")
+    parser.add_argument("--term", default="quest", help="search, filter and Replace All term")
+    parser.add_argument("--replacement", default="mission")
+    parser.add_argument("--edits", type=int, default=50, help="single edits saved one by one")
+    parser.add_argument("--output", help="write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE", help="results JSON of an earlier run to compare against")
+    parser.add_argument("--max-slowdown", type=float, help="with --compare, exit with 1 if a median is this many times slower")
+    return parser
+
+def main(argv=None):
+    options = build_arg_parser().parse_args(argv)
+    work_dir = tempfile.mkdtemp(prefix="yaml-text-bench-")
+    try:
+        corpus_path = options.corpus
+        if corpus_path:
+            corpus = {"path": os.path.abspath(corpus_path)}
+        else:
+            corpus_path = os.path.join(work_dir, "generated")
+            corpus = generate_corpus.generate_corpus(corpus_path, options)
+        corpus_path = os.path.abspath(corpus_path)
+        results = run_benchmarks(corpus_path, options, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "format": RESULTS_FORMAT_VERSION,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "ruamel_yaml": getattr(sys.modules.get("ruamel.yaml"), "__version__", None),
+                        "revision": git_revision(), "parse_cache_version": yaml_text_engine.PARSE_CACHE_VERSION},
+        "corpus": corpus,
+        "repeat": options.repeat,
+        "results": results,
+    }
+    if options.output:
+        with open(options.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    if options.compare:
+        with open(options.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline, options.max_slowdown):
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,18 @@
+"""Fixtures shared by the tests (python -m pytest tests)."""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+@pytest.fixture(scope='session')
+def app_module():
+    """Yaml-Text-Viewer-Editor.py as a module. Tests use its classes without a display, so no Tk root is created."""
+    pytest.importorskip('tkinter')
+    spec = importlib.util.spec_from_file_location("yaml_text_viewer_editor", os.path.join(REPO_DIR, "Yaml-Text-Viewer-Editor.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,55 @@
+"""Tests for the headless command line (python -m pytest tests)."""
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import EXIT_ERROR, EXIT_NO_MATCH, EXIT_OK, main
+
+@pytest.fixture
+def folder(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "a.yaml").write_text('title: "Hello world"\ncount: 3\n', encoding='utf-8')
+    (tmp_path / "sub" / "b.yml").write_text('menu:\n  - "Start game"\n  - "Quit game"\n', encoding='utf-8')
+    return tmp_path
+
+def _run(capsys, *argv):
+    exit_code = main(list(argv))
+    captured = capsys.readouterr()
+    return exit_code, captured.out.splitlines(), captured.err
+
+def test_extract_lists_every_string(folder, capsys):
+    exit_code, lines, _ = _run(capsys, "extract", "--jsonl", "--no-cache", str(folder))
+    assert exit_code == EXIT_OK
+    assert [json.loads(line) for line in lines] == [
+        {'file': "a.yaml", 'key_path': ["title"], 'key': "title", 'text': "Hello world"},
+        {'file': "sub/b.yml", 'key_path': ["menu", 0], 'key': "menu[0]", 'text': "Start game"},
+        {'file': "sub/b.yml", 'key_path': ["menu", 1], 'key': "menu[1]", 'text': "Quit game"}]
+
+def test_grep_exit_codes_and_count(folder, capsys):
+    assert _run(capsys, "grep", "game", str(folder), "--no-cache")[:2] == (EXIT_OK, ["sub/b.yml :: menu[0] :: Start game",
+                                                                                     "sub/b.yml :: menu[1] :: Quit game"])
+    assert _run(capsys, "grep", "-c", "-i", "GAME", str(folder), "--no-cache")[:2] == (EXIT_OK, ["2"])
+    assert _run(capsys, "grep", "absent", str(folder), "--no-cache")[0] == EXIT_NO_MATCH
+    assert _run(capsys, "grep", "game", str(folder), "--no-cache", "--key", "menu[[]1]")[1] == ["sub/b.yml :: menu[1] :: Quit game"]
+    assert _run(capsys, "grep", "(", str(folder), "-E", "--no-cache")[0] == EXIT_ERROR
+
+def test_replace_writes_unless_dry_run(folder, capsys):
+    exit_code, lines, err = _run(capsys, "replace", "game", "match", str(folder), "--no-cache", "--dry-run")
+    assert exit_code == EXIT_OK and len(lines) == 2 and "Dry run" in err
+    assert (folder / "sub" / "b.yml").read_text(encoding='utf-8') == 'menu:\n  - "Start game"\n  - "Quit game"\n'
+    assert _run(capsys, "replace", "game", "match", str(folder), "--no-cache")[0] == EXIT_OK
+    assert (folder / "sub" / "b.yml").read_text(encoding='utf-8') == 'menu:\n  - "Start match"\n  - "Quit match"\n'
+    assert _run(capsys, "replace", "game", "match", str(folder), "--no-cache")[0] == EXIT_NO_MATCH
+
+def test_errors_exit_with_code_2(folder, capsys):
+    assert _run(capsys, "extract", str(folder / "missing"))[0] == EXIT_ERROR
+    (folder / "broken.yaml").write_text('title: "unterminated\n', encoding='utf-8')
+    exit_code, lines, err = _run(capsys, "extract", str(folder), "--no-cache")
+    assert exit_code == EXIT_ERROR and len(lines) == 3 and "broken.yaml" in err
+    exit_code, _, err = _run(capsys, "replace", "game", "match", str(folder), "--no-cache")
+    assert exit_code == EXIT_ERROR and "Not replacing" in err
+    assert (folder / "sub" / "b.yml").read_text(encoding='utf-8') == 'menu:\n  - "Start game"\n  - "Quit game"\n'
@@ -0,0 +1,35 @@
+"""Tests for comparing a folder with its translation (python -m pytest tests)."""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import EXIT_NO_MATCH, EXIT_OK, compare_folder_records, main
+
+def test_strings_are_joined_on_file_and_key_path():
+    source = [(os.path.join("en", "menu.yaml"), [(('start',), "Start"), (('quit',), "Quit"), (('help',), "Help")]),
+              (os.path.join("en", "sub", "only_source.yaml"), [(('title',), "Title")])]
+    target = [(os.path.join("de", "menu.yaml"), [(('start',), "Starten"), (('quit',), "Quit"), (('new',), "Neu")])]
+    assert list(compare_folder_records(iter(source), iter(target), "en", "de")) == [
+        ('changed', "menu.yaml", ('start',), "Start", "Starten"),
+        ('identical', "menu.yaml", ('quit',), "Quit", "Quit"),
+        ('extra', "menu.yaml", ('new',), None, "Neu"),
+        ('missing', "menu.yaml", ('help',), "Help", None),
+        ('missing', "sub/only_source.yaml", ('title',), "Title", None)]
+
+def test_compare_command_lists_the_chosen_statuses(tmp_path, capsys):
+    (tmp_path / "en").mkdir()
+    (tmp_path / "de").mkdir()
+    (tmp_path / "en" / "a.yaml").write_text('start: "Start"\nquit: "Quit"\nhelp: "Help"\n', encoding='utf-8')
+    (tmp_path / "de" / "a.yaml").write_text('start: "Starten"\nquit: "Quit"\n', encoding='utf-8')
+    source_folder, target_folder = str(tmp_path / "en"), str(tmp_path / "de")
+    assert main(["compare", "--no-cache", "--jsonl", "--status", "missing", "--status", "identical",
+                 source_folder, target_folder]) == EXIT_OK
+    captured = capsys.readouterr()
+    assert [(row['status'], row['key']) for row in map(json.loads, captured.out.splitlines())] == [
+        ('identical', "quit"), ('missing', "help")]
+    assert captured.err.strip() == "1 missing, 0 extra, 1 identical, 1 changed"
+    assert main(["compare", "--no-cache", "--count", "--status", "changed", source_folder, target_folder]) == EXIT_OK
+    assert capsys.readouterr().out == "1\n"
+    assert main(["compare", "--no-cache", "--status", "extra", source_folder, target_folder]) == EXIT_NO_MATCH
@@ -0,0 +1,53 @@
+"""Tests for grouping identical strings (python -m pytest tests)."""
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import BackgroundFolderLoader, TextItemStore, _parse_yaml_file, text_digest
+
+def _store(out_of_core=False):
+    store = TextItemStore(out_of_core=out_of_core)
+    store.append_file("a.yaml", [(('ok',), "OK"), (('cancel',), "Cancel"), (('long',), "Long " * 50)])
+    store.append_file("b.yaml", [(('ok',), "OK"), (('title',), "Title"), (('long',), "Long " * 50), (('yes',), "OK")])
+    return store
+
+def _groups(store):
+    return sorted(group.tolist() for group in store.duplicate_groups().values())
+
+def test_repeated_texts_are_grouped():
+    for out_of_core in (False, True):
+        store = _store(out_of_core)
+        assert _groups(store) == [[0, 3, 6], [2, 5]]
+        assert store.identical_items(6).tolist() == [0, 3, 6] and store.identical_items(1).tolist() == [1]
+        store.close()
+
+def test_groups_follow_edits_and_swapped_files():
+    store = _store()
+    _groups(store)
+    store.set_text(3, "Cancel")
+    assert _groups(store) == [[0, 6], [1, 3], [2, 5]]
+    store.replace_files({"b.yaml": None}, sort_key=lambda filepath: filepath)
+    assert _groups(store) == []
+
+def test_colliding_digests_do_not_merge_different_texts():
+    store = TextItemStore()
+    store.append_file("a.yaml", [(('a',), "one"), (('b',), "two"), (('c',), "one")], text_digests=array('Q', [7, 7, 7]))
+    assert _groups(store) == [[0, 1, 2]]
+    assert store.identical_items(0).tolist() == [0, 2] and store.identical_items(1).tolist() == [1]
+
+def test_workers_and_the_cache_hand_out_the_same_digests(tmp_path):
+    path = tmp_path / "a.yaml"
+    path.write_text('ok: "OK"\nnested:\n  - "Ünïcode"\n  - "OK"\n', encoding='utf-8')
+    _, records, _, text_digests, _, _, _ = _parse_yaml_file(str(path))
+    assert text_digests.tolist() == [text_digest(text) for _, text in records]
+    cache_path = str(tmp_path / "cache.sqlite3")
+    for _ in range(2): # Parsed, then answered by the cache
+        loader = BackgroundFolderLoader([str(path)], cache_path=cache_path, max_workers=1)
+        result = None
+        while result is None:
+            result = loader.next_ready(block=True, timeout=0.1)
+        loader.shutdown(wait=True)
+        assert result[3].tolist() == text_digests.tolist()
+    assert loader.cache_hits == 1
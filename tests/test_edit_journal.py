@@ -0,0 +1,107 @@
+"""Tests for the edit journal: undo/redo history and crash recovery (python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import EditJournal, replay_journal
+
+def _journal(tmp_path, **options):
+    return EditJournal(str(tmp_path / "journal" / "edits.journal"), **options)
+
+def test_undo_and_redo_follow_the_logged_operations(tmp_path):
+    journal = _journal(tmp_path)
+    first = journal.record("Edit title", {"a.yaml": [(('title',), "Old", "New")]})
+    second = journal.record("Replace All", {"a.yaml": [(('body',), "x", "y")], "b.yaml": [(('k',), "x", "y")]})
+    assert journal.next_undo() == (second, "Replace All") and journal.next_redo() is None
+    journal.record("Undo Replace All", {"a.yaml": [(('body',), "y", "x")]}, kind='undo', target=second)
+    assert journal.next_undo() == (first, "Edit title") and journal.next_redo() == (second, "Replace All")
+    journal.record("Redo Replace All", {"a.yaml": [(('body',), "x", "y")]}, kind='redo', target=second)
+    assert journal.next_undo() == (second, "Replace All") and journal.next_redo() is None
+    assert journal.edits(second) == {"a.yaml": [(('body',), "x", "y")], "b.yaml": [(('k',), "x", "y")]}
+    journal.record("Undo Replace All", {}, kind='undo', target=second)
+    third = journal.record("Edit body", {"a.yaml": [(('body',), "x", "z")]})
+    assert journal.next_undo() == (third, "Edit body") and journal.next_redo() is None # A new edit clears redo
+    journal.close()
+
+    reopened = _journal(tmp_path)
+    assert reopened.next_undo() == (third, "Edit body")
+    assert reopened.edits(first) == {"a.yaml": [(('title',), "Old", "New")]}
+    reopened.close()
+
+def test_cancelled_operations_leave_no_trace(tmp_path):
+    journal = _journal(tmp_path)
+    first = journal.record("Edit title", {"a.yaml": [(('title',), "Old", "New")]})
+    journal.mark_written(["a.yaml"])
+    second = journal.record("Import", {})
+    journal.add_edits(second, {"a.yaml": [(('title',), "New", "Neu")]})
+    journal.add_edits(second, {"b.yaml": [(('k',), "v", "w")]})
+    assert journal.edits(second) == {"a.yaml": [(('title',), "New", "Neu")], "b.yaml": [(('k',), "v", "w")]}
+    assert journal.pending_edits() == journal.edits(second)
+    journal.cancel(second)
+    assert journal.next_undo() == (first, "Edit title") and not journal.has_pending
+    journal.close()
+    reopened = _journal(tmp_path)
+    assert reopened.next_undo() == (first, "Edit title") and not reopened.has_pending
+    reopened.close()
+
+def test_edits_that_did_not_reach_the_disk_are_replayed(tmp_path):
+    folder = tmp_path / "texts"
+    folder.mkdir()
+    a, b, c = (str(folder / name) for name in ("a.yaml", "b.yaml", "c.yaml"))
+    for path, content in ((a, 'title: "Old"\nbody: "Body"\n'), (b, 'k: "Changed by hand"\n'), (c, 'k: "Done"\n')):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+    journal = _journal(tmp_path)
+    journal.record("Edit", {a: [(('title',), "Old", "Mid")]})
+    journal.record("Edit", {a: [(('title',), "Mid", "New")], b: [(('k',), "v", "w")], c: [(('k',), "Start", "Done")]})
+    journal.close() # As if the program stopped before writing the files
+
+    journal = _journal(tmp_path)
+    assert journal.has_pending
+    written, conflicts = replay_journal(journal)
+    assert written == 1 and conflicts == [(b, ('k',), "changed since the edit")]
+    with open(a, encoding='utf-8') as f:
+        assert f.read() == 'title: "New"\nbody: "Body"\n'
+    assert not journal.has_pending
+    journal.close()
+    assert not _journal(tmp_path).has_pending
+
+def test_a_record_torn_by_a_crash_is_cut_off(tmp_path):
+    journal = _journal(tmp_path)
+    first = journal.record("Edit", {"a.yaml": [(('title',), "Old", "New")]})
+    second = journal.record("Edit", {"a.yaml": [(('title',), "New", "Newer")]})
+    journal.close()
+    path = journal.path
+    size = os.path.getsize(path)
+    with open(path, 'r+b') as f:
+        f.truncate(size - 5) # The second operation's edits record lost its tail
+    reopened = _journal(tmp_path)
+    assert reopened.pending_edits() == {"a.yaml": [(('title',), "Old", "New")]} # Nothing torn is replayed
+    assert reopened.edits(second) == {}
+    third = reopened.record("Edit", {"b.yaml": [(('k',), "v", "w")]})
+    reopened.close()
+    again = _journal(tmp_path)
+    assert again.edits(first) and again.edits(third) == {"b.yaml": [(('k',), "v", "w")]}
+    again.close()
+
+def test_a_large_journal_starts_over_once_nothing_is_pending(tmp_path):
+    journal = _journal(tmp_path)
+    journal.record("Edit", {"a.yaml": [(('title',), "Old", "New " * 100)]})
+    journal.close()
+    pending = _journal(tmp_path, max_bytes=10)
+    assert pending.has_pending and pending.next_undo() is not None # Kept until replayed
+    pending.mark_written(["a.yaml"])
+    pending.close()
+    fresh = _journal(tmp_path, max_bytes=10)
+    assert fresh.next_undo() is None and not fresh.has_pending
+    fresh.close()
+
+def test_a_journal_of_another_version_is_replaced(tmp_path, capsys):
+    journal = _journal(tmp_path)
+    with open(journal.path, 'wb') as f:
+        f.write(b"some other format\n")
+    journal.close()
+    fresh = _journal(tmp_path)
+    assert fresh.next_undo() is None and "written by another version" in capsys.readouterr().out
+    fresh.close()
@@ -0,0 +1,88 @@
+"""Tests for exporting strings for translation and importing them back (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import export_items, import_translations, read_translations
+
+FORMATS = ('jsonl', 'csv', 'xliff')
+
+@pytest.fixture
+def folder(tmp_path):
+    folder = tmp_path / "texts"
+    (folder / "sub").mkdir(parents=True)
+    (folder / "a.yaml").write_text('# Greeting\ntitle: "Hello world"\ncount: 3\n', encoding='utf-8')
+    (folder / "sub" / "b.yaml").write_text('menu:\n  - "Start game"\n  - \'Quit game\'\n', encoding='utf-8')
+    return folder
+
+def _items(folder):
+    return [(str(folder / "a.yaml"), ('title',), "Hello world"),
+            (str(folder / "sub" / "b.yaml"), ('menu', 0), "Start game"),
+            (str(folder / "sub" / "b.yaml"), ('menu', 1), "Quit game")]
+
+def _export(tmp_path, folder, fmt, items):
+    path = tmp_path / f"strings.{fmt}"
+    with open(path, 'w', encoding='utf-8', newline='' if fmt == 'csv' else None) as out:
+        assert export_items(iter(items), out, fmt, str(folder)) == len(items)
+    return path
+
+def _translate(path, old, new):
+    # Each format writes one row per line with the target last, so the last occurrence is the target
+    lines = path.read_text(encoding='utf-8').split('\n')
+    for n, line in enumerate(lines):
+        if old in line:
+            head, _, tail = line.rpartition(old)
+            lines[n] = head + new + tail
+    path.write_text('\n'.join(lines), encoding='utf-8')
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_export_reads_back_unchanged(tmp_path, folder, fmt):
+    items = _items(folder) + [(str(folder / "a.yaml"), ('notes', 'x'), 'Say "hi", & <bye>\nnext line é')]
+    items.sort(key=lambda item: item[0]) # Grouped by file, as extraction yields them
+    path = _export(tmp_path, folder, fmt, items)
+    rows = list(read_translations(str(path), fmt))
+    assert [(relative_file, key_path, source) for relative_file, key_path, source, _ in rows] == [
+        (os.path.relpath(filepath, folder).replace(os.sep, '/'), key_path, text) for filepath, key_path, text in items]
+    assert all(source == target for _, _, source, target in rows)
+
+@pytest.mark.parametrize('fmt', FORMATS)
+def test_import_applies_edited_targets(tmp_path, folder, fmt):
+    path = _export(tmp_path, folder, fmt, _items(folder))
+    _translate(path, "Hello world", "Hallo Welt")
+    _translate(path, "Quit game", "Spiel beenden")
+    logged = []
+    summary = import_translations(str(path), str(folder), log_edits=lambda filepath, edits: logged.append((filepath, edits)))
+    assert (summary.applied, summary.unchanged, summary.conflicts, summary.files_written) == (2, 1, [], 2)
+    # Patched in place: comments, other values and quoting styles stay as they were
+    assert (folder / "a.yaml").read_text(encoding='utf-8') == '# Greeting\ntitle: "Hallo Welt"\ncount: 3\n'
+    assert (folder / "sub" / "b.yaml").read_text(encoding='utf-8') == 'menu:\n  - "Start game"\n  - \'Spiel beenden\'\n'
+    assert logged == [(os.path.join(str(folder), "a.yaml"), [(('title',), "Hello world", "Hallo Welt")]),
+                      (os.path.join(str(folder), "sub", "b.yaml"), [(('menu', 1), "Quit game", "Spiel beenden")])]
+
+def test_import_skips_texts_changed_since_the_export(tmp_path, folder):
+    path = _export(tmp_path, folder, 'jsonl', _items(folder))
+    _translate(path, "Hello world", "Hallo Welt")
+    _translate(path, "Start game", "Spiel starten")
+    (folder / "a.yaml").write_text('title: "Hello there"\n', encoding='utf-8')
+    summary = import_translations(str(path), str(folder))
+    assert summary.conflicts == [("a.yaml", "title", "text in the file differs from the exported source")]
+    assert (summary.applied, summary.files_written) == (1, 1)
+    assert (folder / "a.yaml").read_text(encoding='utf-8') == 'title: "Hello there"\n'
+    assert '"Spiel starten"' in (folder / "sub" / "b.yaml").read_text(encoding='utf-8')
+
+def test_import_dry_run_writes_nothing(tmp_path, folder):
+    path = _export(tmp_path, folder, 'csv', _items(folder))
+    _translate(path, "Hello world", "Hallo Welt")
+    before = (folder / "a.yaml").read_bytes()
+    summary = import_translations(str(path), str(folder), dry_run=True)
+    assert (summary.applied, summary.files_written) == (1, 0)
+    assert (folder / "a.yaml").read_bytes() == before
+
+def test_empty_targets_count_as_unchanged(tmp_path, folder):
+    path = _export(tmp_path, folder, 'xliff', _items(folder))
+    _translate(path, "<target>Hello world</target>", "<target></target>")
+    summary = import_translations(str(path), str(folder))
+    assert (summary.applied, summary.unchanged, summary.conflicts) == (0, 3, [])
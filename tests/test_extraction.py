@@ -0,0 +1,96 @@
+"""Tests for extracting strings through the C loader's events and the round-trip fallback (python -m pytest tests)."""
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml_text_engine
+from yaml_text_engine import DocumentWriteBack, _extract_round_trip_records, _parse_yaml_file
+
+FAST_PATH_SOURCES = {
+    'scalars': 'title: "Hello"\ncount: 3\nflag: true\nnothing: null\nplain: some words\nquoted_number: "42"\n',
+    'nested': 'menu:\n  items:\n    - "One"\n    - two\n    - [nested, list]\n    - label: "Three"\n',
+    'keys': '2: "int key"\ntrue: "bool key"\n"quoted": "x"\n',
+    'block': 'text: |\n  line one\n  line two\nfolded: >-\n  folded\n  text\n',
+    'string_alias': 'base: &name "Shared"\ncopy: *name\n',
+    'tagged': 'explicit: !!str 123\nnumber: !!int "7"\ncustom: !custom x\nlist: [! 1, "two"]\nplain: "kept"\n',
+    'flow': 'inline: {a: "b", c: [d, "e"]}\n',
+}
+FALLBACK_SOURCES = {
+    'merge_key': 'base: &base\n  title: "Hello"\nitem:\n  <<: *base\n  name: "World"\n',
+    'collection_alias': 'base: &base\n  title: "Hello"\ncopy: *base\n',
+    'complex_key': '? [a, b]\n: "value"\nplain: "x"\n',
+}
+
+@pytest.fixture
+def round_trip_calls(monkeypatch):
+    calls = []
+    def counting(yaml_text):
+        calls.append(yaml_text)
+        return _extract_round_trip_records(yaml_text)
+    monkeypatch.setattr(yaml_text_engine, '_extract_round_trip_records', counting)
+    return calls
+
+def _parse(tmp_path, source):
+    path = tmp_path / "file.yaml"
+    path.write_text(source, encoding='utf-8')
+    filepath, records, _, text_digests, error, digest, _ = _parse_yaml_file(str(path))
+    assert error is None and len(text_digests) == len(records) and digest is not None
+    return records
+
+@pytest.mark.parametrize('name', sorted(FAST_PATH_SOURCES))
+def test_fast_path_extracts_what_a_load_would(tmp_path, round_trip_calls, name):
+    source = FAST_PATH_SOURCES[name]
+    assert _parse(tmp_path, source) == _extract_round_trip_records(source)
+    assert round_trip_calls == []
+
+@pytest.mark.parametrize('name', sorted(FALLBACK_SOURCES))
+def test_unusual_files_fall_back_to_the_round_trip_parser(tmp_path, round_trip_calls, name):
+    source = FALLBACK_SOURCES[name]
+    assert _parse(tmp_path, source) == _extract_round_trip_records(source)
+    assert round_trip_calls == [source]
+
+def test_fast_path_records(tmp_path):
+    assert _parse(tmp_path, FAST_PATH_SOURCES['tagged']) == [(('list', 1), "two"), (('plain',), "kept")]
+    assert _parse(tmp_path, FAST_PATH_SOURCES['nested']) == [
+        (('menu', 'items', 0), "One"), (('menu', 'items', 1), "two"), (('menu', 'items', 3, 'label'), "Three")]
+    assert _parse(tmp_path, FAST_PATH_SOURCES['keys']) == [(('2',), "int key"), (('True',), "bool key"), (('quoted',), "x")]
+
+def test_every_document_of_a_stream_is_extracted(tmp_path, round_trip_calls):
+    assert _parse(tmp_path, 'title: "One"\n---\ntitle: "Two"\nmenu: ["x"]\n') == [
+        ((0, 'title'), "One"), ((1, 'title'), "Two"), ((1, 'menu', 0), "x")]
+    assert _parse(tmp_path, '---\ntitle: "Only"\n') == [(('title',), "Only")] # One document needs no index
+    assert _parse(tmp_path, '- "list root"\n---\nkey: "value"\n') == [((1, 'key'), "value")]
+    assert round_trip_calls == []
+
+def test_fallback_reads_every_document_too(tmp_path, round_trip_calls):
+    source = 'base: &base {text: "x"}\ncopy: *base\n---\nother: "y"\n'
+    assert _parse(tmp_path, source) == [((0, 'base', 'text'), "x"), ((0, 'copy', 'text'), "x"), ((1, 'other'), "y")]
+    assert round_trip_calls == [source]
+
+def test_rewritten_stream_keeps_its_other_documents(tmp_path):
+    path = tmp_path / "file.yaml"
+    path.write_text('# Head\ntitle: One\n---\ntitle: Two\n', encoding='utf-8')
+    write_back = DocumentWriteBack()
+    write_back.set_value(str(path), (1, 'title'), "Needs: quotes")
+    assert write_back.flush() == []
+    assert write_back.last_commit_methods == {str(path): "dumped"}
+    assert path.read_text(encoding='utf-8') == "# Head\ntitle: One\n---\ntitle: 'Needs: quotes'\n"
+
+def test_memory_does_not_grow_with_the_file(tmp_path):
+    path = tmp_path / "big.yaml"
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('title: "Big"\n')
+        f.writelines(f'key{n}: {n} # {"comment " * 30}\n' for n in range(15_000)) # ~4 MB, one string
+    _parse(tmp_path, 'title: "warm up"\n')
+    tracemalloc.start()
+    try:
+        filepath, records, _, _, error, _, _ = _parse_yaml_file(str(path))
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert error is None and records == [(('title',), "Big")]
+    assert peak < os.path.getsize(path) / 2
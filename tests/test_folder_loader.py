@@ -0,0 +1,104 @@
+"""Tests for loading folders in the background and caching parsed files (python -m pytest tests)."""
+import hashlib
+import os
+import sys
+from array import array
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml_text_engine
+from yaml_text_engine import BackgroundFolderLoader, ParseCache
+
+def _write_files(tmp_path, count):
+    filepaths = []
+    for n in range(count):
+        path = tmp_path / f"file{n:03}.yaml"
+        path.write_text(f'title: "Title {n}"\nbody:\n  text: "Body of file {n}"\n', encoding='utf-8')
+        filepaths.append(str(path))
+    return filepaths
+
+def _load(filepaths, cache_path=None):
+    loader = BackgroundFolderLoader(filepaths, cache_path=cache_path, max_workers=2)
+    results = []
+    try:
+        while not loader.finished:
+            result = loader.next_ready(block=True, timeout=0.1)
+            if result is not None:
+                results.append(result)
+    finally:
+        loader.shutdown(wait=True)
+    return loader, results
+
+def test_results_come_back_in_file_order(tmp_path):
+    filepaths = _write_files(tmp_path, 30)
+    loader, results = _load(iter(filepaths)) # e.g. the scan_yaml_files generator
+    assert loader.filepaths == filepaths and loader.scan_complete
+    assert [result[0] for result in results] == filepaths
+    assert results[7][1] == [(('title',), "Title 7"), (('body', 'text'), "Body of file 7")]
+    assert all(result[4] is None for result in results)
+
+def test_unreadable_files_are_reported_in_place(tmp_path):
+    filepaths = _write_files(tmp_path, 3)
+    with open(filepaths[1], 'w', encoding='utf-8') as f:
+        f.write('title: "unterminated\n')
+    missing = str(tmp_path / "missing.yaml")
+    loader, results = _load(filepaths + [missing])
+    assert [result[0] for result in results] == filepaths + [missing]
+    assert results[1][1] == [] and results[1][4].startswith("Error parsing")
+    assert results[3][4].startswith("Error reading")
+    assert results[0][4] is None and results[2][4] is None
+
+def test_cache_answers_unchanged_files(tmp_path):
+    filepaths = _write_files(tmp_path, 6)
+    cache_path = str(tmp_path / "cache" / "parse_cache.sqlite3")
+    first_loader, first = _load(filepaths, cache_path)
+    assert first_loader.cache_hits == 0
+    second_loader, second = _load(filepaths, cache_path)
+    assert second_loader.cache_hits == len(filepaths)
+    assert [result[:2] for result in second] == [result[:2] for result in first]
+
+    with open(filepaths[2], 'w', encoding='utf-8') as f:
+        f.write('title: "Changed title"\n')
+    third_loader, third = _load(filepaths, cache_path)
+    assert third_loader.cache_hits == len(filepaths) - 1
+    assert third[2][1] == [(('title',), "Changed title")]
+
+def test_load_without_cache_keeps_no_parsed_files(tmp_path):
+    filepaths = _write_files(tmp_path, 40)
+    loader, results = _load(filepaths)
+    assert len(results) == len(filepaths)
+    # Nothing stores the results, so nothing may hold on to them once they were handed out
+    assert loader._to_cache is None or loader._to_cache.empty()
+    assert not loader._out_of_order
+
+def _store(cache, filepath, records):
+    with open(filepath, 'rb') as f:
+        digest = hashlib.blake2b(f.read(), digest_size=16).digest()
+    cache.store(filepath, os.stat(filepath), digest, records, {}, array('Q', [0] * len(records)))
+
+def test_parse_cache_checks_the_content_of_touched_files(tmp_path):
+    filepath = _write_files(tmp_path, 1)[0]
+    cache = ParseCache(str(tmp_path / "cache.sqlite3"))
+    records = [(('title',), "Title 0")]
+    _store(cache, filepath, records)
+    assert cache.lookup(filepath, os.stat(filepath))[0] == records
+
+    stat_result = os.stat(filepath)
+    os.utime(filepath, ns=(stat_result.st_atime_ns, stat_result.st_mtime_ns + 10**9)) # Touched, same content
+    assert cache.lookup(filepath, os.stat(filepath))[0] == records
+
+    with open(filepath, 'r+b') as f: # Same size, other content
+        f.write(b'TITLE')
+    assert cache.lookup(filepath, os.stat(filepath)) is None
+    cache.close()
+
+def test_parse_cache_starts_over_when_its_layout_changes(tmp_path, monkeypatch):
+    filepath = _write_files(tmp_path, 1)[0]
+    cache_path = str(tmp_path / "cache.sqlite3")
+    cache = ParseCache(cache_path)
+    _store(cache, filepath, [(('title',), "Title 0")])
+    cache.close()
+    monkeypatch.setattr(yaml_text_engine, 'PARSE_CACHE_VERSION', yaml_text_engine.PARSE_CACHE_VERSION + 1)
+    cache = ParseCache(cache_path)
+    assert cache.lookup(filepath, os.stat(filepath)) is None
+    cache.close()
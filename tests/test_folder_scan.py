@@ -0,0 +1,48 @@
+"""Tests for finding the YAML files of a folder (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import find_yaml_files, scan_order_key, scan_yaml_files
+
+@pytest.fixture
+def folder(tmp_path):
+    for relative_path in ("b.yaml", "a.yml", "notes.txt", "z/deep/c.yaml", "m/d.yaml", "m/.git/e.yaml", "m/f.YAML"):
+        path = tmp_path.joinpath(*relative_path.split('/'))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text('title: "x"\n', encoding='utf-8')
+    return tmp_path
+
+def _relative(folder, filepaths):
+    return [os.path.relpath(filepath, folder).replace(os.sep, '/') for filepath in filepaths]
+
+def test_files_come_in_depth_first_name_order(folder):
+    filepaths = list(scan_yaml_files(str(folder)))
+    assert _relative(folder, filepaths) == ["a.yml", "b.yaml", "m/d.yaml", "m/.git/e.yaml", "z/deep/c.yaml"]
+    assert sorted(filepaths, key=lambda filepath: scan_order_key(str(folder), filepath)) == filepaths
+
+def test_include_and_exclude_patterns(folder):
+    assert _relative(folder, find_yaml_files(str(folder), include="*.yaml; *.YAML", exclude=".git")) == [
+        "b.yaml", "m/d.yaml", "m/f.YAML", "z/deep/c.yaml"]
+    # Patterns also match the path relative to the folder
+    assert _relative(folder, find_yaml_files(str(folder), exclude=["z/*"])) == ["a.yml", "b.yaml", "m/d.yaml", "m/.git/e.yaml"]
+
+def test_non_recursive_scan_stays_in_the_folder(folder):
+    assert _relative(folder, find_yaml_files(str(folder), recursive=False)) == ["a.yml", "b.yaml"]
+
+def test_large_files_are_skipped(folder, capsys):
+    (folder / "big.yaml").write_text('title: "' + "x" * 2000 + '"\n', encoding='utf-8')
+    assert "big.yaml" not in _relative(folder, find_yaml_files(str(folder), max_file_size=1000))
+    assert "over the 1000 byte limit" in capsys.readouterr().err
+    assert "big.yaml" in _relative(folder, find_yaml_files(str(folder)))
+
+@pytest.mark.skipif(not hasattr(os, 'symlink'), reason="needs symlinks")
+def test_symlink_loops_end(folder):
+    try:
+        os.symlink(str(folder / "m"), str(folder / "m" / "loop"), target_is_directory=True)
+    except OSError:
+        pytest.skip("cannot create symlinks here")
+    assert _relative(folder, find_yaml_files(str(folder), exclude=".git")) == ["a.yml", "b.yaml", "m/d.yaml", "z/deep/c.yaml"]
@@ -0,0 +1,137 @@
+"""Tests for watching the loaded folder and patching changed files in (python -m pytest tests)."""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import (FolderWatcher, ItemFilter, TextItemStore, TrigramIndex, _parse_yaml_file,
+                              item_index_mapper, scan_yaml_files)
+
+def _wait_for_changes(watcher, known_filepaths, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        changed, removed = watcher.take_changes(known_filepaths, quiet_period=0.1)
+        if changed or removed:
+            return changed, removed
+        time.sleep(0.05)
+    return [], []
+
+@pytest.mark.parametrize('use_native', (False, True))
+def test_added_changed_and_deleted_files_are_reported(tmp_path, use_native):
+    if use_native:
+        pytest.importorskip('watchdog')
+    (tmp_path / "sub").mkdir()
+    kept, changed_file, deleted = tmp_path / "a.yaml", tmp_path / "sub" / "b.yaml", tmp_path / "c.yaml"
+    for path in (kept, changed_file, deleted):
+        path.write_text('title: "x"\n', encoding='utf-8')
+    known_filepaths = {str(kept), str(changed_file), str(deleted)}
+    watcher = FolderWatcher(str(tmp_path), exclude="skipped", poll_interval=0.05, use_native=use_native).start()
+    try:
+        time.sleep(0.2) # Let the poller take its first snapshot
+        changed_file.write_text('title: "a longer title"\n', encoding='utf-8')
+        deleted.unlink()
+        (tmp_path / "new.yml").write_text('title: "new"\n', encoding='utf-8')
+        (tmp_path / "notes.txt").write_text("not yaml\n", encoding='utf-8')
+        (tmp_path / "skipped").mkdir()
+        (tmp_path / "skipped" / "d.yaml").write_text('title: "x"\n', encoding='utf-8')
+        changed, removed = _wait_for_changes(watcher, known_filepaths)
+    finally:
+        watcher.stop()
+    assert sorted(changed) == sorted([str(changed_file), str(tmp_path / "new.yml")])
+    assert removed == [str(deleted)]
+
+def test_changes_wait_for_a_quiet_period(tmp_path):
+    watcher = FolderWatcher(str(tmp_path), use_native=False)
+    watcher.defer([str(tmp_path / "a.yaml")])
+    watcher._note(str(tmp_path / "a.yaml"))
+    assert watcher.take_changes(set(), quiet_period=60) == ([], [])
+    (tmp_path / "a.yaml").write_text('title: "x"\n', encoding='utf-8')
+    assert watcher.take_changes(set(), quiet_period=0) == ([str(tmp_path / "a.yaml")], [])
+
+def test_item_indices_follow_replaced_files():
+    # Items 0-1 are file A, 2-4 file B (now 1 item), 5-6 file C (removed), 7-9 file D
+    remap = item_index_mapper([(2, 3, None, 1), (5, 2, None, 0)])
+    assert [remap(idx) for idx in range(10)] == [
+        (0, False), (1, False), (2, True), (2, True), (2, True), (3, True), (3, True), (3, False), (4, False), (5, False)]
+
+class _Master:
+    """Runs the callbacks of after() when run_pending() is called, in place of a Tk root."""
+
+    def __init__(self):
+        self.pending = {}
+        self._next_id = 0
+
+    def after(self, ms, callback, *args):
+        self._next_id += 1
+        self.pending[self._next_id] = (callback, args)
+        return self._next_id
+
+    def after_cancel(self, after_id):
+        self.pending.pop(after_id, None)
+
+    def run_pending(self):
+        pending, self.pending = self.pending, {}
+        for callback, args in pending.values():
+            callback(*args)
+
+class _Var:
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class _ListView:
+    row_items, first_row, highlighted_item = None, 0, None
+
+    def refresh(self):
+        pass
+
+class _WriteBack:
+    dirty = {}
+
+def _app(app_module, folder):
+    """A YamlTextEditorApp with folder loaded, without a Tk root or widgets."""
+    app = app_module.YamlTextEditorApp.__new__(app_module.YamlTextEditorApp)
+    app.master, app.status_var, app.current_folder_path = _Master(), _Var(), _Var(str(folder))
+    app.list_view, app.write_back = _ListView(), _WriteBack()
+    app.text_data, app.search_index = TextItemStore(), TrigramIndex()
+    app.item_filter = ItemFilter(app.text_data, str(folder))
+    for filepath in scan_yaml_files(str(folder)):
+        _, records, trigram_postings, text_digests, error, _, _ = _parse_yaml_file(filepath)
+        assert error is None
+        app.text_data.append_file(filepath, records, text_digests)
+        app.search_index.add_file(trigram_postings, len(records))
+    app.parse_cache_path, app._file_signatures = None, {}
+    app._folder_loader = app._session_check = app._edit_window = None
+    app._reload_loader, app._reload_patches = None, {}
+    app.current_search_result, app.last_search_offset = None, (0, 0)
+    app._item_count_for_status = len(app.text_data)
+    return app
+
+def test_window_patches_in_the_files_the_watcher_reports(app_module, tmp_path):
+    for name in ("a.yaml", "b.yaml", "c.yaml"):
+        (tmp_path / name).write_text(f'title: "{name} title"\nbody: "{name} body"\n', encoding='utf-8')
+    app = _app(app_module, tmp_path)
+    app._watcher = FolderWatcher(str(tmp_path), poll_interval=0.05, use_native=False).start()
+    try:
+        time.sleep(0.2)
+        (tmp_path / "b.yaml").write_text('title: "New b title"\n', encoding='utf-8')
+        (tmp_path / "c.yaml").unlink()
+        app._poll_watcher()
+        deadline = time.monotonic() + 10
+        while len(app.text_data) != 3 and time.monotonic() < deadline: # A reload that never finishes fails here
+            time.sleep(0.05)
+            app.master.run_pending()
+    finally:
+        app._stop_watcher()
+    assert [(os.path.basename(filepath), key_path, text) for filepath, key_path, text in app.text_data.iter_items()] == [
+        ("a.yaml", ('title',), "a.yaml title"), ("a.yaml", ('body',), "a.yaml body"), ("b.yaml", ('title',), "New b title")]
+    assert app._reload_loader is None and app.status_var.get().startswith("Updated the rows of 2 ")
+    assert app.search_index.candidates("new b") == [2] and app.search_index.candidates("c.yaml") == []
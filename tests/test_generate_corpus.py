@@ -0,0 +1,40 @@
+"""Tests for the synthetic benchmark corpus (python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+
+import generate_corpus
+from yaml_text_engine import _parse_yaml_file, find_yaml_files
+
+def _generate(folder, *argv):
+    options = generate_corpus.build_arg_parser().parse_args([str(folder), "--files", "12", "--strings-per-file", "40", *argv])
+    return generate_corpus.generate_corpus(str(folder), options)
+
+def _contents(folder):
+    contents = {}
+    for filepath in find_yaml_files(str(folder)):
+        with open(filepath, 'rb') as f:
+            contents[os.path.relpath(filepath, folder)] = f.read()
+    return contents
+
+def test_same_seed_writes_the_same_corpus(tmp_path):
+    first, second, other = _generate(tmp_path / "a"), _generate(tmp_path / "b"), _generate(tmp_path / "c", "--seed", "2")
+    assert first == second and first['options']['seed'] == 1
+    assert _contents(tmp_path / "a") == _contents(tmp_path / "b") != _contents(tmp_path / "c")
+    assert other['files'] == 12 and len(_contents(tmp_path / "c")) == 12
+
+def test_every_generated_string_is_extracted(tmp_path):
+    summary = _generate(tmp_path, "--documents", "2", "--duplicate-ratio", "0.5", "--multiline-ratio", "0.3",
+                        "--symbol-density", "0.3", "--subfolders", "3")
+    filepaths = find_yaml_files(str(tmp_path))
+    assert len({os.path.dirname(filepath) for filepath in filepaths}) == 3
+    record_count = 0
+    for filepath in filepaths:
+        _, records, _, _, error, _, _ = _parse_yaml_file(filepath)
+        assert error is None, error
+        assert records and all(isinstance(key_path[0], int) for key_path, _ in records) # Two documents per file
+        record_count += len(records)
+    assert record_count == summary['strings']
+    assert summary['bytes'] == sum(os.path.getsize(filepath) for filepath in filepaths)
@@ -0,0 +1,48 @@
+"""Tests for replacing glossary terms in one pass (python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import EXIT_NO_MATCH, EXIT_OK, GlossaryReplacer, main, read_glossary
+
+def test_longest_term_wins_and_replacements_are_literal():
+    glossary = GlossaryReplacer([("cat", "dog"), ("cat food", "kibble"), ("a.b", r"\1")])
+    assert glossary.subn("cat food for a cat, a.b axb") == (r"kibble for a dog, \1 axb", 3)
+
+def test_case_insensitive_terms_replace_every_match():
+    glossary = GlossaryReplacer([("istanbul", "Constantinople"), ("mass", "weight"), ("οδοσ", "street")],
+                                case_sensitive=False)
+    for text, expected in (("İSTANBUL", "Constantinople"), ("Istanbul", "Constantinople"), ("Maſs", "weight"),
+                           ("ΟΔΟΣ", "street"), ("οδος", "street")):
+        new_text, count = glossary.subn(text)
+        assert (new_text, count) == (expected, 1), text
+
+def test_whole_word_skips_parts_of_words():
+    glossary = GlossaryReplacer([("cat", "dog")], whole_word=True)
+    assert glossary.subn("cat catalog (cat)") == ("dog catalog (dog)", 2)
+
+def test_glossary_files(tmp_path):
+    csv_path, tsv_path, json_path = tmp_path / "terms.csv", tmp_path / "terms.tsv", tmp_path / "terms.json"
+    csv_path.write_text('\ufeffFind,Replace\ncolour,color\n"a, b",c\nlonely\n', encoding='utf-8')
+    tsv_path.write_text('source\ttarget\nfoo\tbar\n', encoding='utf-8')
+    json_path.write_text('{"grey": "gray", "n": 1}', encoding='utf-8')
+    assert read_glossary(str(csv_path)) == (("colour", "color"), ("a, b", "c"))
+    assert read_glossary(str(tsv_path)) == (("foo", "bar"),)
+    assert read_glossary(str(json_path)) == (("grey", "gray"), ("n", "1"))
+
+def test_glossary_command_writes_every_file(tmp_path, capsys):
+    folder = tmp_path / "texts"
+    folder.mkdir()
+    (folder / "a.yaml").write_text('title: "The Colour Grey"\ncount: 3\n', encoding='utf-8')
+    (folder / "b.yaml").write_text('title: "Nothing here"\n', encoding='utf-8')
+    glossary_path = tmp_path / "terms.csv"
+    glossary_path.write_text('colour,color\ngrey,gray\n', encoding='utf-8')
+    assert main(["glossary", "--no-cache", "-i", "--dry-run", str(glossary_path), str(folder)]) == EXIT_OK
+    assert (folder / "a.yaml").read_text(encoding='utf-8') == 'title: "The Colour Grey"\ncount: 3\n'
+    assert main(["glossary", "--no-cache", "-i", str(glossary_path), str(folder)]) == EXIT_OK
+    # Matched case-insensitively, replaced with the glossary's spelling
+    assert (folder / "a.yaml").read_text(encoding='utf-8') == 'title: "The color gray"\ncount: 3\n'
+    assert (folder / "b.yaml").read_text(encoding='utf-8') == 'title: "Nothing here"\n'
+    assert main(["glossary", "--no-cache", str(glossary_path), str(folder)]) == EXIT_NO_MATCH
+    capsys.readouterr()
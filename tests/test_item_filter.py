@@ -0,0 +1,111 @@
+"""Tests for filtering the rows of the list (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml_text_engine
+from yaml_text_engine import ItemFilter, SearchScope, TextItemStore
+
+FOLDER = os.path.join(os.sep, "texts")
+
+def _store():
+    store = TextItemStore()
+    store.append_file(os.path.join(FOLDER, "menu.yaml"), [(('menu', 'start'), "Start Game"), (('menu', 'quit'), "Quit game")])
+    store.append_file(os.path.join(FOLDER, "npc", "guard.yaml"), [(('dialog', 0), "Halt!"), (('dialog', 1), "Move along, game over")])
+    return store
+
+def _run(item_filter, term, mode='text'):
+    run = item_filter.start(term, mode)
+    while not run.advance(0.01):
+        pass
+    return run
+
+@pytest.mark.parametrize('mode, term, expected', [
+    ('text', "GAME", [0, 1, 3]),
+    ('key', "menu.q", [1]),
+    ('key', "dialog[1]", [3]),
+    ('file', "npc/", [2, 3]),
+    ('text', "nowhere", []),
+])
+def test_modes_match_case_insensitively(mode, term, expected):
+    assert _run(ItemFilter(_store(), FOLDER), term, mode).items.tolist() == expected
+
+def test_longer_terms_only_rescan_earlier_matches():
+    item_filter = ItemFilter(_store(), FOLDER)
+    game = _run(item_filter, "game")
+    narrowed = item_filter.start("game over", 'text')
+    assert narrowed.source is game.items
+    assert _run(item_filter, "game over").items.tolist() == [3]
+    assert item_filter.start("game", 'text') is game # Backspacing returns the kept result
+
+def test_runs_are_time_sliced(monkeypatch):
+    monkeypatch.setattr(yaml_text_engine, 'FILTER_CHUNK_ITEMS', 1)
+    run = ItemFilter(_store(), FOLDER).start("game", 'text')
+    assert run.advance(0) is False and run.items.tolist() == [0] and run.progress == 0.25
+    assert run.advance(1) is True and run.items.tolist() == [0, 1, 3]
+
+def test_invalidate_drops_results_of_edited_items():
+    store = _store()
+    item_filter = ItemFilter(store, FOLDER)
+    assert _run(item_filter, "halt").items.tolist() == [2]
+    store.set_text(0, "Halt and start")
+    item_filter.invalidate()
+    assert _run(item_filter, "halt").items.tolist() == [0, 2]
+
+class _Var:
+    def __init__(self, value=None):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+    def set(self, value):
+        self.value = value
+
+class _Master:
+    def after(self, ms, callback, *args):
+        return "after id"
+
+    def after_cancel(self, after_id):
+        pass
+
+class _ListView:
+    row_items, first_row = None, 0
+
+    def refresh(self):
+        pass
+
+def _app(app_module, term, mode_label="Text"):
+    app = app_module.YamlTextEditorApp.__new__(app_module.YamlTextEditorApp) # Without a Tk root
+    app.master, app.status_var, app.list_view = _Master(), _Var(), _ListView()
+    app.filter_var, app.filter_mode_var = _Var(term), _Var(mode_label)
+    app.current_folder_path, app.scope_keys_var, app.scope_files_var = _Var(FOLDER), _Var(""), _Var("")
+    app._search_scope = (None, SearchScope(None))
+    app.text_data = _store()
+    app.item_filter = ItemFilter(app.text_data, FOLDER)
+    app._folder_loader = app._filter_run = app._filter_debounce_id = app._filter_after_id = app._restored_top_item = None
+    return app
+
+def test_replace_all_and_glossary_use_every_row_the_filter_shows(app_module, monkeypatch):
+    monkeypatch.setattr(yaml_text_engine, 'FILTER_CHUNK_ITEMS', 1)
+    monkeypatch.setattr(app_module, 'FILTER_TIME_SLICE_S', 0)
+    app = _app(app_module, "game")
+    app._apply_filter()
+    assert app.list_view.row_items.tolist() == [0] # Only the first slice so far
+    app._finish_filter_run()
+    assert app.list_view.row_items.tolist() == [0, 1, 3] and app._filter_run is None
+    assert app._shown_candidates(range(len(app.text_data))).tolist() == [0, 1, 3]
+    assert app._shown_candidates([1, 2, 3]) == [1, 3]
+    assert app._replace_target_description() == "in the 3 row(s) the filter shows"
+    app.scope_keys_var.set("menu.*")
+    assert app._replace_target_description() == "in the 3 row(s) the filter shows (in scope)"
+
+def test_without_a_filter_every_item_is_a_candidate(app_module):
+    app = _app(app_module, "")
+    app._apply_filter()
+    assert app.list_view.row_items is None
+    assert app._shown_candidates(range(4)) == range(4)
+    assert app._replace_target_description() == "in all loaded files"
@@ -0,0 +1,61 @@
+"""Tests for the column store of the extracted strings (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import TextItemStore, TrigramIndex, _build_trigram_postings
+
+FILES = {
+    "a.yaml": [(('title',), "Title A"), (('menu', 0), "Start"), (('menu', 1), "Quit")],
+    "b.yaml": [(('title',), "Title B")],
+    "c.yaml": [(('dialog', 'npc', 'line'), "Hello"), (('dialog', 'npc', 'reply'), "Bye")],
+}
+
+def _store():
+    store = TextItemStore()
+    for filepath, records in FILES.items():
+        store.append_file(filepath, records)
+    return store
+
+def test_items_read_like_the_old_dicts():
+    store = _store()
+    assert len(store) == 6 and store.file_ranges == {"a.yaml": (0, 3), "b.yaml": (3, 1), "c.yaml": (4, 2)}
+    item = store[2]
+    assert (item['filepath'], item['key_path'], item['message_key'], item['original_text']) == (
+        "a.yaml", ('menu', 1), "menu[1]", "Quit")
+    item['original_text'] = "Exit"
+    assert store.text(2) == "Exit" and store.file_records("a.yaml")[2] == (('menu', 1), "Exit")
+    with pytest.raises(KeyError):
+        item['filepath'] = "other.yaml"
+    with pytest.raises(IndexError):
+        store[6]
+    # Items with the same parent share one key-path prefix
+    assert store.key_path_id(4)[0] == store.key_path_id(5)[0] != store.key_path_id(0)[0]
+
+def test_iter_items_lists_every_item_in_order():
+    assert list(_store().iter_items()) == [(filepath, key_path, text) for filepath, records in FILES.items()
+                                           for key_path, text in records]
+
+def test_replace_files_keeps_file_order_and_reports_changes():
+    store = _store()
+    new_b = [(('title',), "New B"), (('body',), "Body B")]
+    patches = {"b.yaml": (new_b, _build_trigram_postings(new_b), None), "a.yaml": (FILES["a.yaml"], {}, None),
+               "c.yaml": None, "0.yaml": ([(('title',), "First")], {}, None)}
+    changes = store.replace_files(patches, sort_key=lambda filepath: filepath)
+    # a.yaml is unchanged, so it is not reported; 0.yaml is added in front of it
+    assert [(first, count, new_count) for first, count, _, new_count in changes] == [(0, 0, 1), (3, 1, 2), (4, 2, 0)]
+    assert list(store.iter_items()) == [("0.yaml", ('title',), "First")] + [
+        ("a.yaml", key_path, text) for key_path, text in FILES["a.yaml"]] + [("b.yaml", key_path, text) for key_path, text in new_b]
+    assert store.file_ranges == {"0.yaml": (0, 1), "a.yaml": (1, 3), "b.yaml": (4, 2)}
+
+def test_trigram_index_follows_replaced_files():
+    store, index = _store(), TrigramIndex()
+    for filepath, records in FILES.items():
+        index.add_file(_build_trigram_postings(records), len(records))
+    new_b = [(('title',), "Renamed")]
+    index.replace_files(store.replace_files({"b.yaml": (new_b, _build_trigram_postings(new_b), None)}, sort_key=lambda f: f))
+    assert index.candidates("renamed") == [3]
+    assert index.candidates("hello") == [4] and index.candidates("title b") == []
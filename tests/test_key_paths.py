@@ -0,0 +1,32 @@
+"""Tests for addressing values by structured key paths (python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import DocumentWriteBack, format_key_path, get_value_by_path, set_value_by_path
+
+def test_key_paths_are_formatted_for_display():
+    assert format_key_path(('menu', 'items', 0, 'label')) == "menu.items[0].label"
+    assert format_key_path((2, 'menu', 'title')) == "[2].menu.title"
+    assert format_key_path(('grid', 1, 2)) == "grid[1][2]"
+
+def test_tokens_address_keys_with_dots_and_non_string_keys():
+    data = {'a.b': "flat", 'a': {'b': "nested"}, 1: {'x': ["zero", "one"]}}
+    assert get_value_by_path(data, ('a.b',)) == "flat"
+    assert get_value_by_path(data, ('a', 'b')) == "nested"
+    assert get_value_by_path(data, ('1', 'x', 1)) == "one"
+    assert get_value_by_path(data, ('1', 'x', 2)) is None
+    assert get_value_by_path(data, ('a', 0)) is None
+    assert set_value_by_path(data, ('1', 'x', 0), "ZERO")
+    assert data[1]['x'] == ["ZERO", "one"]
+    assert not set_value_by_path(data, ('1', 'x', 5), "out of range")
+
+def test_write_back_edits_only_the_addressed_key(tmp_path):
+    path = tmp_path / "dots.yaml"
+    path.write_text('a.b: "flat"\na:\n  b: "nested"\nlist:\n  - "[0]"\n', encoding='utf-8')
+    write_back = DocumentWriteBack()
+    write_back.set_value(str(path), ('a', 'b'), "NESTED")
+    write_back.set_value(str(path), ('list', 0), "first")
+    assert write_back.flush() == []
+    assert path.read_text(encoding='utf-8') == 'a.b: "flat"\na:\n  b: "NESTED"\nlist:\n  - "first"\n'
@@ -0,0 +1,70 @@
+"""Tests for the virtualized item list of the window (python -m pytest tests)."""
+from array import array
+
+class _FakeText:
+    """Records what VirtualListView.refresh draws, in place of a tk.Text."""
+
+    def __init__(self, height):
+        self.height = height
+        self.lines = []
+        self.highlighted_line = None
+
+    def winfo_height(self):
+        return self.height
+
+    def config(self, **options):
+        pass
+
+    def delete(self, start, end):
+        self.lines = []
+        self.highlighted_line = None
+
+    def insert(self, index, *chunks): # text, tags, text, tags, ...
+        self.lines.append("".join(chunks[::2]).rstrip("\n"))
+
+    def tag_add(self, tag, start, end):
+        self.highlighted_line = int(start.split('.')[0])
+
+class _FakeScrollbar:
+    def set(self, first, last):
+        self.position = (first, last)
+
+def _view(app_module, item_count, visible_rows=20):
+    rendered = []
+    def row_segments(item):
+        rendered.append(item)
+        return [f"item {item}", "text_preview_color"]
+    view = app_module.VirtualListView.__new__(app_module.VirtualListView) # Without a Tk root
+    view._item_count, view._row_segments = (lambda: item_count), row_segments
+    view.row_items, view.first_row, view.highlighted_item = None, 0, None
+    view.text, view.scrollbar, view._line_height = _FakeText(visible_rows * 10), _FakeScrollbar(), 10
+    return view, rendered
+
+def test_only_the_visible_rows_are_rendered(app_module):
+    view, rendered = _view(app_module, 1_000_000)
+    view.first_row = 500_000
+    view.refresh()
+    assert rendered == list(range(500_000, 500_021)) # One more for a partly visible last line
+    assert view.text.lines[0] == "item 500000"
+    assert view.scrollbar.position == (0.5, 0.50002)
+
+def test_scrolling_stays_within_the_rows(app_module):
+    view, _ = _view(app_module, 100)
+    view.scroll_rows(1000)
+    assert view.first_row == 80
+    view._on_scrollbar('moveto', '0.25')
+    assert view.first_row == 25
+    view.scroll_rows(-1000)
+    assert view.first_row == 0
+
+def test_rows_follow_the_filtered_items(app_module):
+    view, _ = _view(app_module, 1000)
+    view.row_items = array('I', range(0, 1000, 2))
+    assert view.row_count() == 500
+    assert view.item_at_row(10) == 20
+    assert view.row_of_item(20) == 10 and view.row_of_item(21) is None
+    assert not view.see(21)
+    assert view.see(600)
+    assert view.first_row == 290 # Row 300 centred
+    view.highlight(600)
+    assert view.text.lines[view.text.highlighted_line - 1] == "item 600"
@@ -0,0 +1,63 @@
+"""Tests for keeping long texts on disk (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import TEXT_PREVIEW_CHARS, SidecarTextFile, TextItemStore
+
+LONG = "Long text é ✓ " * 40
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.delenv('LOCALAPPDATA', raising=False)
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+def test_sidecar_reads_back_what_was_appended(tmp_path):
+    sidecar = SidecarTextFile(directory=str(tmp_path), cache_bytes=100)
+    texts = [LONG, "short", "", "\ud800 lone surrogate", LONG.upper()]
+    locations = [sidecar.append(text) for text in texts]
+    try:
+        assert [sidecar.read(*location) for location in locations] == texts
+        assert [sidecar.read(*location) for location in reversed(locations)] == texts[::-1]
+        assert sidecar._cache_bytes <= 100 or len(sidecar._cache) == 1 # The LRU stays within its limit
+    finally:
+        sidecar.close()
+
+def test_only_previews_of_long_texts_stay_in_memory(cache_dir):
+    store = TextItemStore(out_of_core=True)
+    store.append_file("a.yaml", [(('short',), "Short"), (('long',), LONG)])
+    try:
+        assert os.path.isdir(cache_dir) # The sidecar is created in the cache folder
+        assert store.preview(0) == "Short" and store.preview(1) == LONG[:TEXT_PREVIEW_CHARS + 1]
+        assert store.text(1) == LONG and store[1]['original_text'] == LONG
+        assert list(store.iter_items()) == [("a.yaml", ('short',), "Short"), ("a.yaml", ('long',), LONG)]
+    finally:
+        store.close()
+
+def test_edits_move_texts_in_and_out_of_the_sidecar():
+    store = TextItemStore(out_of_core=True)
+    store.append_file("a.yaml", [(('first',), "Short"), (('second',), LONG)])
+    try:
+        store.set_text(0, LONG + "!")
+        store.set_text(1, "Now short")
+        assert (store.text(0), store.text(1)) == (LONG + "!", "Now short")
+        assert store.preview(0) == (LONG + "!")[:TEXT_PREVIEW_CHARS + 1] and store.preview(1) == "Now short"
+        assert store.identical_items(0).tolist() == [0]
+    finally:
+        store.close()
+
+def test_swapped_files_keep_their_long_texts():
+    store = TextItemStore(out_of_core=True)
+    for name in ("a.yaml", "b.yaml", "c.yaml"):
+        store.append_file(name, [(('text',), f"{name} {LONG}")])
+    try:
+        store.replace_files({"b.yaml": ([(('text',), "b changed " + LONG)], {}, None), "a.yaml": None},
+                            sort_key=lambda filepath: filepath)
+        assert [text for _, _, text in store.iter_items()] == ["b changed " + LONG, f"c.yaml {LONG}"]
+        assert store.file_records("c.yaml") == [(('text',), f"c.yaml {LONG}")]
+    finally:
+        store.close()
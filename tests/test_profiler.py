@@ -0,0 +1,80 @@
+"""Tests for the opt-in profiler and its Chrome trace export (python -m pytest tests)."""
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import Profiler
+
+def test_disabled_profiler_records_nothing():
+    profiler = Profiler()
+    with profiler.span("load", files=3):
+        pass
+    profiler.record("parse file", time.perf_counter(), 0.5)
+    assert not profiler.events and profiler.summary() == [] and profiler.peak_memory is None
+
+def test_spans_add_up_per_name_and_only_outermost_spans_are_reported():
+    profiler = Profiler()
+    profiler.enable()
+    reported = []
+    profiler.listener = lambda name, seconds: reported.append(name)
+
+    @profiler.timed("inner")
+    def inner():
+        time.sleep(0.01)
+
+    with profiler.span("outer", term="x"):
+        inner()
+        inner()
+    worker = threading.Thread(target=inner)
+    worker.start()
+    worker.join()
+    assert reported == ["outer"] # Not nested spans, nor spans of other threads
+    summary = {name: (count, total, longest) for name, count, total, longest in profiler.summary()}
+    assert summary["inner"][0] == 3 and summary["outer"][0] == 1
+    assert summary["outer"][1] >= 0.02 and summary["inner"][2] <= summary["inner"][1]
+    assert [event["name"] for event in profiler.events] == ["inner", "inner", "outer", "inner"]
+    assert profiler.events[2]["args"] == {"term": "x"}
+    profiler.reset()
+    assert not profiler.events and profiler.summary() == []
+
+def test_chrome_trace_names_worker_processes(tmp_path):
+    profiler = Profiler()
+    profiler.enable()
+    profiler.record_file("a.yaml", (12345, time.perf_counter(), 0.25, 0.05))
+    with profiler.span("load"):
+        pass
+    path = str(tmp_path / "trace.json")
+    assert profiler.export_chrome_trace(path) == 3
+    with open(path, encoding='utf-8') as f:
+        trace = json.load(f)
+    processes = {event["pid"]: event["args"]["name"] for event in trace["traceEvents"] if event["ph"] == "M"}
+    assert processes == {os.getpid(): "main", 12345: "parser worker"}
+    spans = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [(event["name"], event["pid"]) for event in spans] == [
+        ("parse file", 12345), ("index trigrams", 12345), ("load", os.getpid())]
+    assert spans[0]["dur"] == 0.25e6 and spans[1]["ts"] == spans[0]["ts"] + spans[0]["dur"]
+    assert profiler.slowest_files() == [("a.yaml", 0.3)]
+
+def test_next_operation_runs_under_cprofile():
+    profiler = Profiler()
+    profiler.enable()
+    profiler.profile_next_operation()
+    with profiler.span("sort"):
+        sorted(range(1000), key=lambda n: -n)
+    name, stats = profiler.last_profile
+    assert name == "sort" and stats.total_calls > 1000
+
+def test_memory_tracking_reports_a_peak():
+    profiler = Profiler()
+    profiler.enable(track_memory=True)
+    try:
+        data = bytearray(4 * 1024 * 1024)
+        del data
+        assert profiler.peak_memory >= 4 * 1024 * 1024
+    finally:
+        profiler.disable()
+    assert profiler.peak_memory is None
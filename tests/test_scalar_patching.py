@@ -0,0 +1,58 @@
+"""Tests for writing edited strings in place, keeping the rest of the file (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import _NeedsFullDump, make_round_trip_parser, patch_scalars_in_source, render_file_edits
+
+def test_every_scalar_style_is_kept():
+    source = ('# Comment\n'
+              'plain: Hello   # note\n'
+              "single: 'It''s'\n"
+              'double: "Tab\\there"\n'
+              'literal: |\n  line one\n  line two\n'
+              'folded: >-\n  folded\n  text\n'
+              'flow: {a: x, b: "y"}\n')
+    edits = {('plain',): "Bye now", ('single',): "O'Neil", ('double',): 'Q "x"\n', ('literal',): "new\nlines\n",
+             ('folded',): "f t", ('flow', 'a'): "z"}
+    assert patch_scalars_in_source(source, edits) == (
+        '# Comment\n'
+        'plain: Bye now   # note\n'
+        "single: 'O''Neil'\n"
+        'double: "Q \\"x\\"\\n"\n'
+        'literal: |\n  new\n  lines\n'
+        'folded: >-\n  f t\n'
+        'flow: {a: z, b: "y"}\n')
+
+def test_line_breaks_and_byte_order_mark_are_kept():
+    assert patch_scalars_in_source('\ufeffk: "v"\r\nm: w\r\n', {('k',): "a\nb"}) == '\ufeffk: "a\\nb"\r\nm: w\r\n'
+
+def test_documents_of_a_stream_are_addressed_by_index():
+    assert patch_scalars_in_source('---\na: "1"\n---\na: "2"\n', {(1, 'a'): "two"}) == '---\na: "1"\n---\na: "two"\n'
+
+@pytest.mark.parametrize('source, edits', [
+    ('a: &x "v"\nb: *x\n', {('a',): "n"}), # Shared through an alias
+    ('a: "v"\n', {('missing',): "n"}),
+    ('literal: |\n  x\n', {('literal',): " leading space"}),
+    ('a: v\n', {('a',): "b: c"}), # Not valid as a plain scalar
+])
+def test_values_that_cannot_be_patched_ask_for_a_full_dump(source, edits):
+    with pytest.raises(_NeedsFullDump):
+        patch_scalars_in_source(source, edits)
+
+def test_changed_values_are_not_overwritten():
+    with pytest.raises(ValueError):
+        patch_scalars_in_source('a: "v"\n', {('a',): "new"}, expected={('a',): "old"})
+
+def test_render_file_edits_falls_back_to_the_loaded_tree(tmp_path):
+    path = tmp_path / "a.yaml"
+    path.write_text('a: v\nb: "w"\n', encoding='utf-8')
+    yaml_parser = make_round_trip_parser()
+    assert render_file_edits(str(path), {('b',): "x"}, yaml_parser) == ('a: v\nb: "x"\n', "patched")
+    document, method = render_file_edits(str(path), {('a',): "b: c"}, yaml_parser)
+    assert method == "dumped" and document['a'] == "b: c" and document['b'] == "w"
+    with pytest.raises(LookupError):
+        render_file_edits(str(path), {('missing', 'deeper'): "x"}, yaml_parser)
@@ -0,0 +1,63 @@
+"""Tests for narrowing searches with the trigram index (python -m pytest tests)."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import TrigramIndex, _build_trigram_postings, compile_search_pattern
+
+TEXTS = ["Welcome to İstanbul", "ΟΔΟΣ ΤΟΥ ΗΛΙΟΥ", "Maſs effect", "plain text", "DİYARBAKIR"]
+
+def _index(texts):
+    index = TrigramIndex()
+    index.add_file(_build_trigram_postings([((str(i),), text) for i, text in enumerate(texts)]), len(texts))
+    return index
+
+def test_case_insensitive_candidates_include_every_match():
+    index = _index(TEXTS)
+    for term in ("istanbul", "İSTANBUL", "οδοσ τ", "mass", "diyarbakır", "plain"):
+        pattern = compile_search_pattern(term, case_sensitive=False)
+        matches = {i for i, text in enumerate(TEXTS) if pattern.search(text)}
+        assert matches, term
+        assert matches <= set(index.candidates(term)), term
+
+def _postings(texts):
+    return _build_trigram_postings([((str(i),), text) for i, text in enumerate(texts)])
+
+def test_candidates_are_the_items_holding_every_trigram():
+    index = _index(["red apple", "green apple", "red cherry", "ap"])
+    assert index.candidates("apple") == [0, 1]
+    assert index.candidates("red ch") == [2]
+    assert index.candidates("banana") == []
+    assert index.candidates("ap") == range(4) # Too short to narrow down
+    assert index.candidates_any(["cherry", "green"]) == [1, 2]
+
+def test_edited_items_are_found_by_their_new_text():
+    index = _index(["red apple", "green apple"])
+    generation = index.generation
+    index.update(0, "yellow banana")
+    assert index.generation > generation
+    assert index.candidates("banana") == [0]
+    assert 0 in index.candidates("apple") # May over-report, never misses
+
+def test_replaced_files_shift_later_items():
+    index = TrigramIndex()
+    for texts in (["alpha one", "alpha two"], ["beta one", "beta two"], ["gamma one"]):
+        index.add_file(_postings(texts), len(texts))
+    index.update(4, "gamma edited")
+    index.replace_files([(2, 2, _postings(["beta new", "beta newer", "beta newest"]), 3)])
+    assert index.candidates("beta") == [2, 3, 4]
+    assert index.candidates("gamma") == [5]
+    assert index.candidates("edited") == [5]
+    index.replace_files([(0, 2, {}, 0)]) # File removed
+    assert index.candidates("beta") == [0, 1, 2]
+    assert index.candidates("alpha") == []
+
+def test_files_without_postings_are_searched_until_filled():
+    index = TrigramIndex()
+    index.add_file(None, 2)
+    index.add_file(_postings(["other text"]), 1)
+    assert index.candidates("first") == [0, 1]
+    index.fill_postings({0: _postings(["first text", "second text"])})
+    assert index.candidates("first") == [0]
+    assert index.candidates("text") == [0, 1, 2]
@@ -0,0 +1,125 @@
+"""Tests for saving and restoring sessions (python -m pytest tests)."""
+import os
+import sys
+import tracemalloc
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import yaml_text_engine
+from yaml_text_engine import TEXT_PREVIEW_CHARS, TextItemStore, find_stale_files, read_session, write_session
+
+def _records(file_number, count, length):
+    return [(('strings', n), f"File {file_number} string {n} " + "x" * length) for n in range(count)]
+
+def _store(out_of_core, tmp_path, length=20):
+    store = TextItemStore(out_of_core=out_of_core)
+    for file_number in range(3):
+        store.append_file(str(tmp_path / f"file{file_number}.yaml"), _records(file_number, 4, length))
+    store.set_text(1, "edited " + "y" * 300)
+    return store
+
+def _save_and_restore(store, tmp_path, out_of_core):
+    path = str(tmp_path / "session.bin")
+    write_session(path, {'items': store.snapshot()}, store.write_bodies)
+    session = read_session(path)
+    return TextItemStore.from_snapshot(session['items'], out_of_core=out_of_core, bodies=session['bodies'])
+
+def _items(store):
+    return list(store.iter_items())
+
+def test_in_memory_store_round_trips(tmp_path):
+    store = _store(False, tmp_path)
+    restored = _save_and_restore(store, tmp_path, out_of_core=False)
+    assert _items(restored) == _items(store)
+    assert restored.file_ranges == store.file_ranges
+
+def test_out_of_core_store_round_trips_in_either_mode(tmp_path):
+    store = _store(True, tmp_path, length=500)
+    for out_of_core in (True, False):
+        restored = _save_and_restore(store, tmp_path, out_of_core)
+        assert restored.out_of_core == out_of_core
+        assert _items(restored) == _items(store)
+        assert all(restored.preview(idx)[:TEXT_PREVIEW_CHARS] == store.preview(idx)[:TEXT_PREVIEW_CHARS] for idx in range(len(store)))
+        restored.close()
+    store.close()
+
+def test_out_of_core_snapshot_keeps_long_texts_on_disk(tmp_path):
+    store = _store(True, tmp_path, length=500)
+    assert all(len(text) <= TEXT_PREVIEW_CHARS + 1 for text in store.snapshot()[6])
+    store.close()
+
+def test_out_of_core_session_does_not_load_the_texts(tmp_path):
+    store = TextItemStore(out_of_core=True)
+    for file_number in range(20):
+        store.append_file(str(tmp_path / f"file{file_number}.yaml"), _records(file_number, 50, 20000)) # ~20 MB
+    tracemalloc.start()
+    try:
+        restored = _save_and_restore(store, tmp_path, out_of_core=True)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 8 * 1024 * 1024
+    assert restored.text(999) == store.text(999)
+    restored.close()
+    store.close()
+
+def test_unsaved_bodies_are_refused(tmp_path):
+    store = _store(True, tmp_path, length=500)
+    snapshot = store.snapshot()
+    store.close()
+    try:
+        TextItemStore.from_snapshot(snapshot, out_of_core=True)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a snapshot without its bodies was restored")
+
+def test_sessions_it_cannot_read_are_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "session.bin"
+    assert read_session(str(path)) is None
+    path.write_bytes(b"something else entirely")
+    assert read_session(str(path)) is None
+    write_session(str(path), {'folder': "x"})
+    with open(path, 'r+b') as f: # Cut off inside the compressed dump
+        f.truncate(os.path.getsize(path) - 4)
+    assert read_session(str(path)) is None
+    write_session(str(path), {'folder': "x"})
+    assert read_session(str(path))['folder'] == "x"
+    monkeypatch.setattr(yaml_text_engine, 'SESSION_FORMAT_VERSION', yaml_text_engine.SESSION_FORMAT_VERSION + 1)
+    assert read_session(str(path)) is None
+
+def test_cut_off_bodies_are_refused(tmp_path):
+    store = _store(True, tmp_path, length=500)
+    path = str(tmp_path / "session.bin")
+    write_session(path, {'items': store.snapshot()}, store.write_bodies)
+    store.close()
+    with open(path, 'r+b') as f:
+        f.truncate(os.path.getsize(path) - 10)
+    session = read_session(path)
+    with pytest.raises(ValueError):
+        TextItemStore.from_snapshot(session['items'], out_of_core=True, bodies=session['bodies'])
+
+def test_failed_save_keeps_the_previous_session(tmp_path):
+    path = str(tmp_path / "session.bin")
+    write_session(path, {'folder': "old"})
+    def failing_bodies(f):
+        f.write(b"partial")
+        raise OSError("disk full")
+    with pytest.raises(OSError):
+        write_session(path, {'folder': "new"}, failing_bodies)
+    assert read_session(path)['folder'] == "old"
+    assert os.listdir(tmp_path) == ["session.bin"]
+
+def test_files_changed_since_the_session_are_found(tmp_path):
+    for name in ("a.yaml", "b.yaml", "c.yaml"):
+        (tmp_path / name).write_text('title: "x"\n', encoding='utf-8')
+    signatures = {str(tmp_path / name): (os.stat(tmp_path / name).st_mtime_ns, os.stat(tmp_path / name).st_size)
+                  for name in ("a.yaml", "b.yaml", "c.yaml")}
+    (tmp_path / "b.yaml").write_text('title: "longer"\n', encoding='utf-8')
+    (tmp_path / "c.yaml").unlink()
+    (tmp_path / "d.yaml").write_text('title: "new"\n', encoding='utf-8')
+    stale, removed, unchanged = find_stale_files(str(tmp_path), signatures)
+    assert stale == [str(tmp_path / "b.yaml"), str(tmp_path / "d.yaml")]
+    assert removed == [str(tmp_path / "c.yaml")] and list(unchanged) == [str(tmp_path / "a.yaml")]
@@ -0,0 +1,121 @@
+"""Tests for writing edits back to YAML files (python -m pytest tests)."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yaml_text_engine import (CommitError, DocumentWriteBack, apply_replacements, commit_documents, import_translations,
+                              iter_folder_records)
+
+MERGE_KEY_SOURCE = ('base: &base\n'
+                    '  title: "Hello"\n'
+                    'item:\n'
+                    '  <<: *base\n'
+                    '  name: "World"\n')
+
+def _write(tmp_path, name, content):
+    path = tmp_path / name
+    path.write_text(content, encoding='utf-8', newline='')
+    return str(path)
+
+def _read(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return f.read()
+
+def test_write_back_edits_file_with_merge_key(tmp_path):
+    filepath = _write(tmp_path, "merge.yaml", MERGE_KEY_SOURCE)
+    write_back = DocumentWriteBack()
+    write_back.set_value(filepath, ('item', 'name'), "Earth")
+    assert write_back.flush() == []
+    assert _read(filepath) == MERGE_KEY_SOURCE.replace('"World"', '"Earth"')
+
+def test_replace_in_file_with_merge_key(tmp_path):
+    filepath = _write(tmp_path, "merge.yaml", MERGE_KEY_SOURCE)
+    apply_replacements({filepath: [(('item', 'name'), "World", "Earth", 1)]})
+    records = dict(next(iter(iter_folder_records([filepath])))[1])
+    assert records[('item', 'name')] == "Earth"
+    assert records[('item', 'title')] == "Hello" # Still merged in from base
+
+def test_import_only_rewrites_the_translated_string(tmp_path):
+    source = ('menu:\n'
+              '    - "PARTY\\\\C[2]"\n'
+              '    - "A long line of text that goes on past the eighty character width a full dump would wrap at"\n'
+              'name: Hero\n')
+    folder = tmp_path / "folder"
+    folder.mkdir()
+    filepath = _write(folder, "a.yaml", source)
+    translations = _write(tmp_path, "strings.jsonl",
+                          '{"file": "a.yaml", "key_path": ["name"], "source": "Hero", "target": "Heroine"}\n')
+    summary = import_translations(translations, str(folder))
+    assert (summary.applied, summary.files_written) == (1, 1)
+    assert _read(filepath) == source.replace("Hero\n", "Heroine\n")
+
+def test_edits_are_written_once_per_file_on_flush(tmp_path):
+    first = _write(tmp_path, "first.yaml", 'a: "one"\nb: "two"\nc: "three"\n')
+    second = _write(tmp_path, "second.yaml", 'a: "uno"\n')
+    write_back = DocumentWriteBack()
+    write_back.set_value(first, ('a',), "ONE")
+    write_back.set_value(first, ('c',), "THREE")
+    write_back.set_value(first, ('a',), "One") # The last edit of a string wins
+    write_back.set_value(second, ('a',), "UNO")
+    assert set(write_back.dirty) == {first, second}
+    assert _read(first) == 'a: "one"\nb: "two"\nc: "three"\n' # Nothing is written before flush
+    assert write_back.flush() == []
+    assert set(write_back.last_commit_timings) == {first, second}
+    assert write_back.last_commit_methods == {first: "patched", second: "patched"}
+    assert _read(first) == 'a: "One"\nb: "two"\nc: "THREE"\n'
+    assert _read(second) == 'a: "UNO"\n'
+    assert not write_back.dirty
+
+def test_files_changed_on_disk_are_not_overwritten(tmp_path):
+    changed = _write(tmp_path, "changed.yaml", 'a: "one"\n')
+    untouched = _write(tmp_path, "untouched.yaml", 'a: "uno"\n')
+    write_back = DocumentWriteBack()
+    write_back.set_value(changed, ('a',), "ONE")
+    write_back.set_value(untouched, ('a',), "UNO")
+    with open(changed, 'w', encoding='utf-8') as f:
+        f.write('a: "edited elsewhere"\n')
+
+    failures = write_back.flush(all_or_nothing=True)
+    assert [filepath for filepath, _ in failures] == [changed]
+    assert _read(untouched) == 'a: "uno"\n' # All or nothing
+    assert set(write_back.dirty) == {changed, untouched}
+
+    assert [filepath for filepath, _ in write_back.flush()] == [changed]
+    assert _read(untouched) == 'a: "UNO"\n'
+    assert _read(changed) == 'a: "edited elsewhere"\n'
+    assert set(write_back.dirty) == {changed}
+
+def _leftovers(folder):
+    return sorted(name for name in os.listdir(folder) if name.endswith(('.tmp', '.bak')))
+
+def test_commit_writes_every_file(tmp_path):
+    filepaths = [_write(tmp_path, f"f{n}.yaml", f'a: "{n}"\n') for n in range(5)]
+    timings = commit_documents({filepath: f'a: "new {n}"\n' for n, filepath in enumerate(filepaths)})
+    assert set(timings) == set(filepaths)
+    assert [_read(filepath) for filepath in filepaths] == [f'a: "new {n}"\n' for n in range(5)]
+    assert _leftovers(tmp_path) == []
+
+def test_commit_changes_nothing_if_a_file_cannot_be_dumped(tmp_path):
+    filepaths = [_write(tmp_path, f"f{n}.yaml", f'a: "{n}"\n') for n in range(3)]
+    documents = {filepath: 'a: "new"\n' for filepath in filepaths}
+    documents[filepaths[1]] = {'a': object()} # Not representable
+    with pytest.raises(CommitError) as error:
+        commit_documents(documents)
+    assert [filepath for filepath, _ in error.value.failures] == [filepaths[1]]
+    assert [_read(filepath) for filepath in filepaths] == [f'a: "{n}"\n' for n in range(3)]
+    assert _leftovers(tmp_path) == []
+
+def test_commit_restores_replaced_files_if_a_rename_fails(tmp_path):
+    filepaths = [_write(tmp_path, f"f{n}.yaml", f'a: "{n}"\n') for n in range(3)]
+    blocked = tmp_path / "blocked.yaml" # A folder in the way of the rename
+    blocked.mkdir()
+    (blocked / "keep").write_text("x")
+    documents = {filepath: 'a: "new"\n' for filepath in filepaths}
+    documents[str(blocked)] = 'a: "new"\n'
+    with pytest.raises(CommitError):
+        commit_documents(documents)
+    assert [_read(filepath) for filepath in filepaths] == [f'a: "{n}"\n' for n in range(3)]
+    assert _leftovers(tmp_path) == []